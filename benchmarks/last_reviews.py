@@ -0,0 +1,82 @@
+"""
+Measures the lookup of the latest review of each submit of a receiver:
+"computed" selects them from all reviews (`Review.objects.last_reviews`, DISTINCT ON on PostgreSQL,
+a correlated subquery elsewhere), "pointer" reads `Submit.last_review` (`Submit.with_reviews`).
+The database of DJANGO_SETTINGS_MODULE is used (by default the database of the example project),
+run it with settings of each backend to compare them.
+
+    python benchmarks/last_reviews.py [number of reviews ...]
+"""
+import sys
+
+from utils import setup_django, test_database, timed
+
+setup_django(database=True)
+
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.core.management import call_command  # noqa: E402
+from django.db import transaction  # noqa: E402
+from django.utils import timezone  # noqa: E402
+from django.utils.six import StringIO  # noqa: E402
+
+from example.tasks.models import Task  # noqa: E402
+from submit.models import Review, Submit, SubmitReceiver  # noqa: E402
+
+SIZES = [10000, 100000, 1000000]
+REVIEWS_PER_SUBMIT = 3
+RECEIVERS = 10
+BATCH_SIZE = 10000
+
+
+def create_reviews(count):
+    """
+    Creates `count` reviews of submits spread evenly among RECEIVERS receivers.
+    Returns the receiver whose submits are looked up.
+    """
+    user = get_user_model().objects.create_user(username='user%d' % count)
+    task = Task.objects.create(name='Task %d' % count, slug='task%d' % count, visible=True, max_points=10,
+                               deadline=timezone.now())
+    receivers = [SubmitReceiver.objects.create(task=task) for _ in range(RECEIVERS)]
+    submits_count = count // REVIEWS_PER_SUBMIT
+    with transaction.atomic():
+        for start in range(0, submits_count, BATCH_SIZE):
+            Submit.objects.bulk_create([
+                Submit(user=user, receiver=receivers[i % RECEIVERS])
+                for i in range(start, min(start + BATCH_SIZE, submits_count))
+            ])
+        submit_ids = list(Submit.objects.filter(user=user).order_by('pk').values_list('pk', flat=True))
+        for start in range(0, count, BATCH_SIZE):
+            Review.objects.bulk_create([
+                Review(submit_id=submit_ids[i % submits_count], score=i % 100, short_response='OK')
+                for i in range(start, min(start + BATCH_SIZE, count))
+            ])
+        # bulk_create bypasses Review.save, pointers are set by the command
+        call_command('update_last_reviews', receiver=[receiver.pk for receiver in receivers], stdout=StringIO())
+    return receivers[0]
+
+
+def computed(receiver):
+    return [review.pk for review in Review.objects.last_reviews(Submit.objects.filter(receiver=receiver))]
+
+
+def pointer(receiver):
+    return [submit.last_review.pk for submit in Submit.with_reviews.filter(receiver=receiver)]
+
+
+def main():
+    sizes = [int(size) for size in sys.argv[1:]] or SIZES
+    with test_database() as connection:
+        print('backend: %s' % connection.vendor)
+        print('%9s %9s | %12s %12s' % ('reviews', 'submits', 'computed ms', 'pointer ms'))
+        for count in sizes:
+            receiver = create_reviews(count)
+            assert sorted(computed(receiver)) == sorted(pointer(receiver))
+            print('%9d %9d | %12.1f %12.1f' % (
+                count, Submit.objects.filter(receiver=receiver).count(),
+                timed(lambda: computed(receiver), repeat=3) * 1000,
+                timed(lambda: pointer(receiver), repeat=3) * 1000,
+            ))
+
+
+if __name__ == '__main__':
+    main()
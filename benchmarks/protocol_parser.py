@@ -0,0 +1,57 @@
+"""
+Compares the ElementTree and the streaming (iterparse) protocol parser on synthetic protocols.
+
+    python benchmarks/protocol_parser.py
+"""
+import os
+import shutil
+import tempfile
+import tracemalloc
+
+from utils import setup_django, timed, write_protocol
+
+setup_django()
+
+from submit.judge_helpers import _iterparse_protocol_file, _tree_parse_protocol_file  # noqa: E402
+
+SIZES = [
+    # (number of tests, length of details of each test)
+    (100, 100),
+    (5000, 100),
+    (5000, 2000),
+    (20000, 2000),
+]
+
+
+def peak_memory(function):
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    directory = tempfile.mkdtemp()
+    try:
+        print('%6s %8s %10s | %10s %10s | %10s %10s | %10s' % (
+            'tests', 'details', 'file MB', 'tree s', 'tree MB', 'stream s', 'stream MB', 'stream 100'))
+        for tests, details_length in SIZES:
+            path = os.path.join(directory, '%d-%d.protocol' % (tests, details_length))
+            write_protocol(path, tests, details_length)
+            assert _tree_parse_protocol_file(path) == _iterparse_protocol_file(path)
+
+            print('%6d %8d %10.1f | %10.3f %10.1f | %10.3f %10.1f | %10.1f' % (
+                tests, details_length, os.path.getsize(path) / 1e6,
+                timed(lambda: _tree_parse_protocol_file(path), repeat=3),
+                peak_memory(lambda: _tree_parse_protocol_file(path)) / 1e6,
+                timed(lambda: _iterparse_protocol_file(path), repeat=3),
+                peak_memory(lambda: _iterparse_protocol_file(path)) / 1e6,
+                peak_memory(lambda: _iterparse_protocol_file(path, max_details_length=100)) / 1e6,
+            ))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Measures the protocol handling in a `receive_protocol` callback: writing the POSTed protocol and parsing it.
+"before" writes the protocol to disk and parses it back from the file,
+"after" parses the bytes in memory and writes them atomically (`save_protocol`).
+
+    python benchmarks/receive_protocol.py
+"""
+import itertools
+import os
+import shutil
+import tempfile
+
+from utils import setup_django, timed, write_protocol
+
+setup_django()
+
+from submit import settings as submit_settings  # noqa: E402
+from submit.judge_helpers import _parse_protocol_file, save_protocol  # noqa: E402
+
+SIZES = [
+    # (number of tests, length of details of each test)
+    (20, 100),
+    (100, 100),
+    (1000, 500),
+    (5000, 500),
+]
+CALLBACKS = 20
+
+
+def write_then_parse(path, protocol):
+    # The previous `write_chunks_to_file` followed by parsing of the written file
+    try:
+        os.makedirs(os.path.dirname(path))
+    except os.error:
+        pass
+    with open(path, 'wb+') as destination:
+        destination.write(protocol)
+    return _parse_protocol_file(path)
+
+
+def main():
+    directory = tempfile.mkdtemp()
+    # Stored files must be inside SUBMIT_PATH
+    submit_settings.SUBMIT_PATH = directory
+    try:
+        print('%6s %8s %10s | %12s %12s' % ('tests', 'details', 'file kB', 'before ms', 'after ms'))
+        for tests, details_length in SIZES:
+            source = os.path.join(directory, 'source.protocol')
+            write_protocol(source, tests, details_length)
+            with open(source, 'rb') as protocol_file:
+                protocol = protocol_file.read()
+            path = os.path.join(directory, 'check.protocol')
+            assert write_then_parse(source, protocol) == save_protocol(path, protocol)
+
+            def callbacks(handle, review_ids=itertools.count()):
+                # Each callback stores the protocol of a new review
+                for i in range(CALLBACKS):
+                    handle(os.path.join(directory, 'received', '%d.protocol' % next(review_ids)), protocol)
+
+            print('%6d %8d %10.1f | %12.3f %12.3f' % (
+                tests, details_length, len(protocol) / 1e3,
+                timed(lambda: callbacks(write_then_parse)) / CALLBACKS * 1e3,
+                timed(lambda: callbacks(save_protocol)) / CALLBACKS * 1e3,
+            ))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
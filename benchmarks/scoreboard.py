@@ -0,0 +1,87 @@
+"""
+Measures reads of a scoreboard (`get_scoreboard`) of several tasks with thousands of users:
+"compute" builds it from `UserReceiverScore`, "cache" merges it from cached columns after the process' copy
+expired, "process" returns the copy kept by the process and "patch" updates a cached column after a new score.
+The database and cache of DJANGO_SETTINGS_MODULE are used.
+
+    python benchmarks/scoreboard.py [number of users ...]
+"""
+import sys
+
+from utils import setup_django, test_database, timed
+
+setup_django(database=True)
+
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.core.cache import caches  # noqa: E402
+from django.db import transaction  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from example.tasks.models import Task  # noqa: E402
+from submit import scoreboard_helpers  # noqa: E402
+from submit import settings as submit_settings  # noqa: E402
+from submit.models import Review, Submit, SubmitReceiver, UserReceiverScore  # noqa: E402
+
+SIZES = [100, 1000, 5000]
+TASKS = 8
+
+
+def create_scores(users_count):
+    """
+    Creates a scored submit of each user for each task, returns ids of the tasks.
+    """
+    tasks = [Task.objects.create(name='Task %d %d' % (users_count, i), slug='task-%d-%d' % (users_count, i),
+                                 visible=True, max_points=10, deadline=timezone.now()) for i in range(TASKS)]
+    receivers = [SubmitReceiver.objects.create(task=task) for task in tasks]
+    user_model = get_user_model()
+    with transaction.atomic():
+        user_model.objects.bulk_create([user_model(username='user-%d-%d' % (users_count, i))
+                                        for i in range(users_count)])
+        users = list(user_model.objects.filter(username__startswith='user-%d-' % users_count))
+        Submit.objects.bulk_create([Submit(user=user, receiver=receiver) for user in users for receiver in receivers])
+        submits = Submit.objects.filter(receiver__in=receivers)
+        Review.objects.bulk_create([Review(submit=submit, score=submit.pk % 100, short_response='OK')
+                                    for submit in submits])
+        UserReceiverScore.objects.bulk_create([
+            UserReceiverScore(user_id=review.submit.user_id, receiver_id=review.submit.receiver_id,
+                              score=review.score, review=review)
+            for review in Review.objects.filter(submit__receiver__in=receivers).select_related('submit')
+        ])
+    return [task.pk for task in tasks]
+
+
+def main():
+    sizes = [int(size) for size in sys.argv[1:]] or SIZES
+    cache = caches[submit_settings.SUBMIT_SCOREBOARD_CACHE]
+    with test_database():
+        print('%7s | %12s %12s %12s %12s' % ('users', 'compute ms', 'cache ms', 'process ms', 'patch ms'))
+        for users_count in sizes:
+            task_ids = create_scores(users_count)
+
+            def compute():
+                cache.clear()
+                scoreboard_helpers._memo.clear()
+                scoreboard_helpers.get_scoreboard(task_ids)
+
+            def from_cache():
+                scoreboard_helpers._memo.clear()
+                scoreboard_helpers.get_scoreboard(task_ids)
+
+            def from_process():
+                for _ in range(1000):
+                    scoreboard_helpers.get_scoreboard(task_ids)
+
+            user_id = UserReceiverScore.objects.filter(receiver__task=task_ids[0]).values_list('user', flat=True)[0]
+
+            def patch():
+                scoreboard_helpers._update_column(task_ids[0], user_id)
+
+            compute_time = timed(compute, repeat=3)
+            scoreboard_helpers.get_scoreboard(task_ids)
+            # seconds of 1000 reads are milliseconds of one read
+            print('%7d | %12.2f %12.2f %12.4f %12.2f' % (
+                users_count, compute_time * 1000, timed(from_cache) * 1000, timed(from_process), timed(patch) * 1000))
+
+
+if __name__ == '__main__':
+    main()
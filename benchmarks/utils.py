@@ -0,0 +1,68 @@
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+import django
+from django.conf import settings
+
+EXAMPLE_PROJECT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'example')
+
+
+def setup_django(database=False):
+    """
+    Benchmarks run with the project from DJANGO_SETTINGS_MODULE.
+    When it is not set, benchmarks not needing a database use minimal settings and others use the example project.
+    """
+    sys.path.insert(0, os.path.join(EXAMPLE_PROJECT_DIR, '..'))
+    if not os.environ.get('DJANGO_SETTINGS_MODULE'):
+        if database:
+            sys.path.insert(0, EXAMPLE_PROJECT_DIR)
+            os.environ['DJANGO_SETTINGS_MODULE'] = 'example.settings'
+        else:
+            settings.configure(
+                INSTALLED_APPS=['django.contrib.auth', 'django.contrib.contenttypes', 'submit'],
+                CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}},
+            )
+    django.setup()
+
+
+@contextmanager
+def test_database():
+    """
+    Creates an empty test database (as `manage.py test` does) and destroys it afterwards.
+    """
+    from django.db import connection
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def timed(function, repeat=5):
+    """
+    Returns the best time of `repeat` calls of function, in seconds.
+    """
+    best = None
+    for i in range(repeat):
+        start = time.time()
+        function()
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def write_protocol(path, tests, details_length):
+    """
+    Writes a synthetic protocol with the given number of tests.
+    """
+    details = ('nas  0001: 4\ntvoj 0001: 3\n' * (details_length // 26 + 1))[:details_length]
+    with open(path, 'w') as protocol:
+        protocol.write('<protokol><runLog>\n')
+        for i in range(tests):
+            protocol.write(
+                '<test><name>%d.a.in</name><resultCode>2</resultCode><resultMsg>WA</resultMsg>'
+                '<time>%d</time><details>%s</details></test>\n' % (i, i % 1000, details))
+        protocol.write('<score>42</score></runLog></protokol>\n')
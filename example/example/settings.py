@@ -144,6 +144,7 @@ SUBMIT_PREFETCH_DATA_FOR_SCORE_CALCULATION = 'example.submit_configuration.prefe
 SUBMIT_DISPLAY_SCORE = 'example.submit_configuration.display_score'
 JUDGE_DEFAULT_INPUTS_FOLDER_FOR_RECEIVER = 'example.submit_configuration.default_inputs_folder_at_judge'
 SUBMIT_CAN_POST_SUBMIT = 'example.submit_configuration.can_post_submit'
+SUBMIT_CAN_VIEW_SCOREBOARD = 'example.submit_configuration.can_view_scoreboard'
 
 SUBMIT_TASK_MODEL = 'tasks.Task'
 SUBMIT_PATH = env('SUBMIT_PATH', os.path.join(PROJECT_DIR, 'submit'))
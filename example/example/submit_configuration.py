@@ -2,6 +2,7 @@ from django.utils import timezone
 from django.utils.html import format_html
 from django.utils.translation import ugettext_lazy as _
 
+from example.tasks.models import Task
 from submit.defaults import form_success_message as default_success_message
 from submit.models import Submit
 
@@ -36,6 +37,11 @@ def can_post_submit(receiver, user):
     return task.visible or user.is_staff
 
 
+def can_view_scoreboard(task_ids, user):
+    visible_tasks = Task.objects.filter(pk__in=task_ids, visible=True)
+    return user.is_staff or visible_tasks.count() == len(set(task_ids))
+
+
 def prefetch_data_for_score_calculation(reviews_qs):
     return reviews_qs\
         .select_related('submit__receiver__task')\
@@ -1,14 +1,52 @@
 # TODO: Tests independent on example
 import datetime
 import json
+import os
+import re
+import shutil
+import socket
+import tempfile
+import threading
+import time
 
 from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import Storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
 from django.core.urlresolvers import reverse
-from django.test import TestCase
+from django.db import IntegrityError, connection, connections, transaction
+from django.template.loader import render_to_string
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase
 from django.utils import timezone
+from django.utils.six import StringIO
 
 from example.tasks.models import Task
-from submit.models import SubmitReceiver
+from submit import judge_helpers, scoreboard_helpers
+from submit import settings as submit_settings
+from submit.constants import JudgePriority, JudgeTestResult, ReviewResponse
+from submit.judge_helpers import (JudgeConnectionError, _iterparse_protocol_file, _tree_parse_protocol_file,
+                                  create_review_and_send_to_judge, dispatch_queued_reviews, parse_protocol,
+                                  parse_partial_protocol, retry_unavailable_reviews, save_partial_protocol,
+                                  save_protocol, save_protocols)
+from submit.judge_pool import JudgePool
+from submit.management.commands import backfill_test_results
+from submit.models import (PackedFile, RejudgeJob, Review, ReviewTestResult, Submit, SubmitReceiver,
+                           UserReceiverScore)
+from submit.rejudge_helpers import run_rejudge_job, start_rejudge_job
+from submit.scoreboard_helpers import get_scoreboard
+from submit.statistics_helpers import test_pass_rates, test_time_distribution, test_time_summary
+from submit.storage import (append_to_file, blob_path, file_exists, files_equal, get_storage, open_file, pack_files,
+                            remove_file, remove_unused_file, storage_name, stored_file_path, write_blob,
+                            write_chunks_to_file)
+from submit.submit_helpers import create_submit, get_submit_list_page, send_file
+from submit.templatetags.submit_parts import submit_list
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
 
 
 class ExternalSubmitTests(TestCase):
@@ -94,3 +132,1034 @@ class ExternalSubmitTests(TestCase):
             'score': 10,
         })
         self.assertEqual(response.status_code, 403)
+
+
+DUMMY_TESTER_DIR = os.path.join(os.path.dirname(__file__), '..', '..', 'dummy_tester')
+
+
+class SubmitPathMixin(object):
+    """
+    Stores all submit files to a temporary directory.
+    """
+    def setUp(self):
+        super(SubmitPathMixin, self).setUp()
+        self.submit_path = tempfile.mkdtemp()
+        patcher = mock.patch.object(submit_settings, 'SUBMIT_PATH', self.submit_path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(shutil.rmtree, self.submit_path)
+
+
+class SubmitFixtureMixin(SubmitPathMixin):
+    """
+    Creates user jozko (password 'pass') and a visible task with a receiver created with `receiver_options`.
+    """
+    receiver_options = {}
+
+    def setUp(self):
+        super(SubmitFixtureMixin, self).setUp()
+        self.user = get_user_model().objects.create_user(username='jozko', password='pass')
+        self.task = Task.objects.create(name='Task task', slug='task', visible=True, max_points=10,
+                                        deadline=timezone.now() + datetime.timedelta(weeks=2), )
+        self.receiver = SubmitReceiver.objects.create(task=self.task, **self.receiver_options)
+
+    def _create_submit(self, content=b'print(42)', filename='solution.py', user=None):
+        return create_submit(user=user or self.user, receiver=self.receiver,
+                             sfile=SimpleUploadedFile(filename, content))
+
+
+class JudgeDispatchTests(SubmitFixtureMixin, TestCase):
+    receiver_options = {'has_form': True, 'send_to_judge': True}
+
+    def setUp(self):
+        super(JudgeDispatchTests, self).setUp()
+        self.client.login(username='jozko', password='pass')
+
+    def _post_submit(self):
+        return self.client.post(reverse('post_submit', args=[self.receiver.pk]), {
+            'submit_file': SimpleUploadedFile('solution.txt', b'print(42)'),
+            'redirect_to': '/',
+        })
+
+    @mock.patch.object(submit_settings, 'JUDGE_DISPATCH_IN_BACKGROUND', True)
+    @mock.patch('submit.judge_helpers._send_to_judge')
+    def test_background_dispatch(self, send_to_judge):
+        response = self._post_submit()
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(send_to_judge.called)
+        review = Review.objects.get(submit__receiver=self.receiver)
+        self.assertEqual(review.short_response, ReviewResponse.SENDING_TO_JUDGE)
+
+        call_command('dispatch_to_judge', once=True, stdout=StringIO())
+        self.assertEqual(send_to_judge.call_count, 1)
+        review.refresh_from_db()
+        self.assertEqual(review.short_response, ReviewResponse.SENT_TO_JUDGE)
+
+    @mock.patch('submit.judge_helpers._send_to_judge')
+    def test_inline_dispatch(self, send_to_judge):
+        self._post_submit()
+        self.assertEqual(send_to_judge.call_count, 1)
+        review = Review.objects.get(submit__receiver=self.receiver)
+        self.assertEqual(review.short_response, ReviewResponse.SENT_TO_JUDGE)
+
+    @mock.patch('submit.judge_helpers._send_to_judge')
+    def test_skip_identical_resubmits(self, send_to_judge):
+        self.receiver.skip_identical_resubmits = True
+        self.receiver.save()
+        self._post_submit()
+        review = Review.objects.get(submit__receiver=self.receiver)
+        with open(os.path.join(DUMMY_TESTER_DIR, 'ALL.protocol'), 'rb') as protocol:
+            self.client.post('/submit/receive_protocol/', {
+                'submit_id': review.pk, 'protocol': protocol.read().decode('utf-8'),
+            })
+        self._post_submit()
+        self.assertEqual(send_to_judge.call_count, 1)
+        clone = Review.objects.filter(submit__receiver=self.receiver).latest('pk')
+        self.assertNotEqual(clone.submit_id, review.submit_id)
+        self.assertEqual(clone.short_response, 'WA')
+        self.assertTrue(clone.protocol_exists())
+        self.assertEqual(clone.test_results.count(), 18)
+
+        create_review_and_send_to_judge(clone.submit, force=True)
+        self.assertEqual(send_to_judge.call_count, 2)
+        self.client.post(reverse('post_submit', args=[self.receiver.pk]), {
+            'submit_file': SimpleUploadedFile('solution.txt', b'print(43)'),
+            'redirect_to': '/',
+        })
+        self.assertEqual(send_to_judge.call_count, 3)
+
+    @mock.patch.object(submit_settings, 'JUDGE_DISPATCH_IN_BACKGROUND', True)
+    @mock.patch.object(submit_settings, 'SUBMIT_DEDUPLICATE_FILES', True)
+    def test_identical_resubmit_found_by_hash(self):
+        self.receiver.skip_identical_resubmits = True
+        self.receiver.save()
+        judged = create_review_and_send_to_judge(self._create_submit(filename='solution.txt'))
+        Review.objects.filter(pk=judged.pk).update(short_response='WA')
+        # More different files than are compared byte by byte
+        for i in range(submit_settings.JUDGE_IDENTICAL_RESUBMITS_MAX_COMPARED):
+            review = create_review_and_send_to_judge(self._create_submit(b'print(%d)' % i, filename='solution.txt'))
+            Review.objects.filter(pk=review.pk).update(short_response='WA')
+        with mock.patch('submit.judge_helpers.files_equal') as files_equal:
+            review = create_review_and_send_to_judge(self._create_submit(filename='solution.txt'))
+            self.assertEqual(review.short_response, 'WA')
+            self.assertFalse(files_equal.called)
+
+    @mock.patch.object(submit_settings, 'JUDGE_DISPATCH_IN_BACKGROUND', True)
+    @mock.patch('submit.judge_helpers._send_to_judge')
+    def test_dispatch_priority(self, send_to_judge):
+        submit = self._create_submit(filename='solution.txt')
+        create_review_and_send_to_judge(submit, priority=JudgePriority.LOW)
+        high = create_review_and_send_to_judge(submit, priority=JudgePriority.HIGH)
+        self.assertEqual(dispatch_queued_reviews(1), 1)
+        self.assertEqual(send_to_judge.call_args[0][0], high)
+
+        starving = create_review_and_send_to_judge(submit, priority=JudgePriority.LOW)
+        create_review_and_send_to_judge(submit, priority=JudgePriority.HIGH)
+        Review.objects.filter(pk=starving.pk).update(time=timezone.now() - datetime.timedelta(hours=1))
+        self.assertEqual(dispatch_queued_reviews(1), 1)
+        self.assertEqual(send_to_judge.call_args[0][0], starving)
+        self.assertEqual(dispatch_queued_reviews(10), 2)
+
+    @mock.patch('submit.judge_helpers._send_to_judge')
+    def test_retry_unavailable(self, send_to_judge):
+        send_to_judge.side_effect = JudgeConnectionError
+        self._post_submit()
+        review = Review.objects.get(submit__receiver=self.receiver)
+        self.assertEqual(review.short_response, ReviewResponse.JUDGE_UNAVAILABLE)
+        self.assertEqual(review.judge_attempts, 1)
+        self.assertGreater(review.next_judge_attempt, timezone.now())
+
+        send_to_judge.side_effect = None
+        self.assertEqual(retry_unavailable_reviews(), 0)
+        Review.objects.filter(pk=review.pk).update(next_judge_attempt=timezone.now())
+        self.assertEqual(retry_unavailable_reviews(), 1)
+        review.refresh_from_db()
+        self.assertEqual(review.short_response, ReviewResponse.SENT_TO_JUDGE)
+        self.assertEqual(review.judge_attempts, 2)
+        self.assertIsNone(review.next_judge_attempt)
+
+    @mock.patch.object(submit_settings, 'JUDGE_DISPATCH_IN_BACKGROUND', True)
+    @mock.patch('submit.judge_helpers._send_to_judge')
+    def test_stale_claim_is_retried(self, send_to_judge):
+        review = create_review_and_send_to_judge(self._create_submit(filename='solution.txt'))
+        # The dispatcher is killed while sending
+        send_to_judge.side_effect = KeyboardInterrupt
+        with self.assertRaises(KeyboardInterrupt):
+            dispatch_queued_reviews(1)
+        review.refresh_from_db()
+        self.assertEqual(review.short_response, ReviewResponse.SENT_TO_JUDGE)
+        self.assertIsNone(review.sent_to_judge_time)
+
+        send_to_judge.side_effect = None
+        self.assertEqual(retry_unavailable_reviews(), 0)
+        Review.objects.filter(pk=review.pk).update(next_judge_attempt=timezone.now())
+        self.assertEqual(retry_unavailable_reviews(), 1)
+        review.refresh_from_db()
+        self.assertEqual(review.short_response, ReviewResponse.SENT_TO_JUDGE)
+        self.assertEqual(review.judge_attempts, 2)
+        self.assertIsNotNone(review.sent_to_judge_time)
+        self.assertIsNone(review.next_judge_attempt)
+
+        # A sent review is not a stale claim
+        Review.objects.filter(pk=review.pk).update(next_judge_attempt=timezone.now())
+        self.assertEqual(retry_unavailable_reviews(), 0)
+
+    def test_admission_control(self):
+        pool = JudgePool([('judge', 1)], timeout=1, probe_interval=30, max_in_flight=1)
+        submit = self._create_submit(filename='solution.txt')
+        with mock.patch('submit.judge_helpers.get_judge_pool', return_value=pool), \
+                mock.patch.object(pool.endpoints[0], 'connect') as connect:
+            first = create_review_and_send_to_judge(submit)
+            second = create_review_and_send_to_judge(submit)
+            self.assertEqual(connect.call_count, 1)
+            self.assertEqual(first.judge_endpoint, 'judge:1')
+            self.assertEqual(second.short_response, ReviewResponse.SENDING_TO_JUDGE)
+            self.assertEqual(dispatch_queued_reviews(10), 0)
+
+            Review.objects.filter(pk=first.pk).update(
+                sent_to_judge_time=timezone.now() - datetime.timedelta(hours=1))
+            self.assertEqual(dispatch_queued_reviews(10), 1)
+            self.assertEqual(connect.call_count, 2)
+
+    def test_missing_submit_file(self):
+        pool = JudgePool([('judge', 1)], timeout=1, probe_interval=30)
+        submit = self._create_submit(filename='solution.txt')
+        remove_file(submit.file_path())
+        with mock.patch('submit.judge_helpers.get_judge_pool', return_value=pool), \
+                mock.patch.object(pool.endpoints[0], 'connect') as connect:
+            review = create_review_and_send_to_judge(submit)
+            self.assertEqual(review.short_response, ReviewResponse.SUBMIT_FILE_UNAVAILABLE)
+            self.assertFalse(connect.called)
+            self.assertEqual(pool.in_rotation(), pool.endpoints)
+
+            with mock.patch.object(submit_settings, 'JUDGE_WRITE_RAW_FILE', True), \
+                    mock.patch.object(submit_settings, 'JUDGE_DISPATCH_IN_BACKGROUND', True):
+                queued = create_review_and_send_to_judge(submit)
+                self.assertEqual(dispatch_queued_reviews(10), 1)
+            queued.refresh_from_db()
+            self.assertEqual(queued.short_response, ReviewResponse.SUBMIT_FILE_UNAVAILABLE)
+            self.assertEqual(pool.in_rotation(), pool.endpoints)
+
+    def _start_judge(self, connections):
+        """
+        Starts a judge server that receives data of `connections` submits.
+        """
+        server = socket.socket()
+        server.bind(('127.0.0.1', 0))
+        server.listen(connections)
+        self.addCleanup(server.close)
+        received = []
+
+        def judge():
+            for i in range(connections):
+                connection, address = server.accept()
+                data = b''
+                for chunk in iter(lambda: connection.recv(1024), b''):
+                    data += chunk
+                received.append(data)
+                connection.close()
+
+        thread = threading.Thread(target=judge)
+        thread.start()
+        pool = JudgePool([server.getsockname()], timeout=1, probe_interval=30)
+        return pool, thread, received
+
+    def test_data_received_by_judge(self):
+        pool, thread, received = self._start_judge(1)
+        with mock.patch('submit.judge_helpers.get_judge_pool', return_value=pool):
+            self._post_submit()
+        thread.join(1)
+
+        review = Review.objects.get(submit__receiver=self.receiver)
+        self.assertEqual(review.short_response, ReviewResponse.SENT_TO_JUDGE)
+        lines = received[0].split(b'\n')
+        self.assertEqual(lines[1], str(review.pk).encode())
+        self.assertEqual(lines[5], b'solution.txt')
+        self.assertEqual(lines[6], b'print(42)')
+
+    @mock.patch.object(submit_settings, 'JUDGE_DISPATCH_IN_BACKGROUND', True)
+    def test_concurrent_dispatch(self):
+        pool, thread, received = self._start_judge(3)
+        for i in range(3):
+            self._post_submit()
+        with mock.patch('submit.judge_async.get_judge_pool', return_value=pool):
+            self.assertEqual(dispatch_queued_reviews(10, concurrency=2), 3)
+        thread.join(1)
+
+        self.assertEqual(len(received), 3)
+        self.assertTrue(all(data.endswith(b'\nsolution.txt\nprint(42)') for data in received))
+        self.assertEqual(Review.objects.filter(short_response=ReviewResponse.SENT_TO_JUDGE).count(), 3)
+
+    @mock.patch.object(submit_settings, 'JUDGE_DISPATCH_IN_BACKGROUND', True)
+    def test_concurrent_dispatch_missing_file(self):
+        pool, thread, received = self._start_judge(1)
+        missing = self._create_submit(filename='solution.txt')
+        remove_file(missing.file_path())
+        create_review_and_send_to_judge(missing)
+        self._post_submit()
+        with mock.patch('submit.judge_async.get_judge_pool', return_value=pool):
+            self.assertEqual(dispatch_queued_reviews(10, concurrency=2), 2)
+        thread.join(1)
+
+        self.assertEqual(len(received), 1)
+        self.assertEqual(pool.in_rotation(), pool.endpoints)
+        self.assertEqual(Review.objects.get(submit=missing).short_response, ReviewResponse.SUBMIT_FILE_UNAVAILABLE)
+        self.assertEqual(Review.objects.filter(short_response=ReviewResponse.SENT_TO_JUDGE).count(), 1)
+
+    @mock.patch.object(submit_settings, 'JUDGE_DISPATCH_IN_BACKGROUND', True)
+    def test_full_endpoint_out_of_rotation(self):
+        pool = JudgePool([('judge', 1)], timeout=1, probe_interval=30, max_in_flight=1)
+        pool.endpoints[0].next_probe = time.time() + 30
+        submit = self._create_submit(filename='solution.txt')
+        sent = create_review_and_send_to_judge(submit)
+        Review.objects.filter(pk=sent.pk).update(short_response=ReviewResponse.SENT_TO_JUDGE,
+                                                 judge_endpoint='judge:1', sent_to_judge_time=timezone.now())
+        queued = [create_review_and_send_to_judge(submit) for _ in range(3)]
+        with mock.patch('submit.judge_async.get_judge_pool', return_value=pool):
+            self.assertEqual(dispatch_queued_reviews(10, concurrency=2), 0)
+        with mock.patch('submit.judge_helpers.get_judge_pool', return_value=pool):
+            self.assertEqual(dispatch_queued_reviews(10), 0)
+        self.assertEqual(Review.objects.filter(pk__in=[review.pk for review in queued],
+                                               short_response=ReviewResponse.SENDING_TO_JUDGE).count(), 3)
+
+
+class JudgePoolTests(SimpleTestCase):
+    def setUp(self):
+        self.pool = JudgePool([('judge1', 1), ('judge2', 2)], timeout=1, probe_interval=30)
+        self.judge1, self.judge2 = self.pool.endpoints
+
+    def test_round_robin(self):
+        first = self.pool.candidates()[0]
+        second = self.pool.candidates()[0]
+        self.assertNotEqual(first, second)
+
+    def test_least_outstanding(self):
+        with self.pool.sending(self.judge1):
+            self.assertEqual(self.pool.candidates(), [self.judge2, self.judge1])
+            self.assertEqual(self.pool.candidates(), [self.judge2, self.judge1])
+
+    def test_failed_endpoint_is_probed(self):
+        with self.assertRaises(socket.error):
+            with self.pool.sending(self.judge1):
+                raise socket.error
+        self.assertEqual(self.pool.candidates(), [self.judge2])
+
+        self.judge1.next_probe = 0
+        with mock.patch.object(self.judge1, 'connect', side_effect=socket.error):
+            self.assertEqual(self.pool.candidates(), [self.judge2])
+        self.assertGreater(self.judge1.next_probe, 0)
+
+        self.judge1.next_probe = 0
+        with mock.patch.object(self.judge1, 'connect'):
+            self.assertEqual(len(self.pool.candidates()), 2)
+
+    def test_last_endpoint_is_tried(self):
+        pool = JudgePool([('judge', 1)], timeout=1, probe_interval=30)
+        endpoint = pool.endpoints[0]
+        pool.take_out_of_rotation(endpoint)
+        self.assertEqual(pool.candidates(), [endpoint])
+        with pool.sending(endpoint):
+            pass
+        self.assertTrue(endpoint.in_rotation)
+
+
+@mock.patch('submit.judge_helpers._send_to_judge')
+class RejudgeJobTests(SubmitFixtureMixin, TestCase):
+    receiver_options = {'has_form': True, 'send_to_judge': True}
+
+    def setUp(self):
+        super(RejudgeJobTests, self).setUp()
+        self.staff = get_user_model().objects.create_user(username='staff', password='pass', is_staff=True)
+        for user in (self.user, self.user, self.staff):
+            self._create_submit(filename='solution.txt', user=user)
+
+    def test_rejudge_receiver(self, send_to_judge):
+        self.client.login(username='staff', password='pass')
+        url = reverse('rejudge_receiver_submits', args=[self.receiver.pk])
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertFalse(RejudgeJob.objects.exists())
+
+        response = self.client.post(url, {'submits_per_second': 1000})
+        self.assertEqual(response.status_code, 302)
+        job = RejudgeJob.objects.get()
+        self.assertEqual(job.total, 3)
+
+        self.assertTrue(run_rejudge_job(job))
+        self.assertEqual((job.status, job.done, job.failed), (RejudgeJob.FINISHED, 3, 0))
+        self.assertEqual(send_to_judge.call_count, 3)
+
+    def test_only_latest_and_resume(self, send_to_judge):
+        job = start_rejudge_job(self.receiver, self.staff, only_latest=True, submits_per_second=1000)
+        self.assertEqual(job.total, 2)
+
+        RejudgeJob.objects.filter(pk=job.pk).update(status=RejudgeJob.PAUSED)
+        self.assertFalse(run_rejudge_job(job))
+        self.assertEqual(job.pending(), 2)
+
+        RejudgeJob.objects.filter(pk=job.pk).update(status=RejudgeJob.PENDING)
+        self.assertTrue(run_rejudge_job(job))
+        self.assertEqual(job.done, 2)
+        self.assertEqual(send_to_judge.call_count, 2)
+
+
+class ProtocolTests(SubmitPathMixin, SimpleTestCase):
+    def setUp(self):
+        super(ProtocolTests, self).setUp()
+        self.protocol_path = os.path.join(self.submit_path, 'test.protocol')
+        shutil.copy(os.path.join(DUMMY_TESTER_DIR, 'ALL.protocol'), self.protocol_path)
+
+    def test_parse(self):
+        data = parse_protocol(self.protocol_path)
+        self.assertTrue(data['ready'])
+        self.assertFalse(data['compile_log_present'])
+        self.assertEqual(data['final_result'], 'WA')
+        self.assertEqual(data['tests'][1]['name'], '00.sample.b.in')
+        self.assertTrue(data['tests'][1]['show_details'])
+        self.assertFalse(data['tests'][3]['show_details'])
+        self.assertTrue(parse_protocol(self.protocol_path, force_show_details=True)['tests'][3]['show_details'])
+
+    def test_parsed_protocol_is_cached(self):
+        data = parse_protocol(self.protocol_path)
+        with mock.patch('submit.judge_helpers._parse_protocol_file') as parse:
+            self.assertEqual(parse_protocol(self.protocol_path), data)
+            self.assertFalse(parse.called)
+
+        with open(self.protocol_path, 'wb') as protocol:
+            protocol.write(b'<protokol><compileLog>error</compileLog></protokol>')
+        self.assertEqual(parse_protocol(self.protocol_path)['final_result'], 'CERR')
+
+    def test_save_protocol(self):
+        with open(self.protocol_path, 'rb') as protocol:
+            data = save_protocol(os.path.join(self.submit_path, 'saved.protocol'), protocol.read())
+        self.assertEqual(data['final_result'], 'WA')
+        with mock.patch('submit.judge_helpers._parse_protocol_file') as parse:
+            self.assertEqual(parse_protocol(os.path.join(self.submit_path, 'saved.protocol'))['score'], data['score'])
+            self.assertFalse(parse.called)
+
+    def test_corrupted(self):
+        with open(self.protocol_path, 'wb') as protocol:
+            protocol.write(b'<protokol><runLog>')
+        self.assertFalse(parse_protocol(self.protocol_path)['ready'])
+
+    def test_streaming_parser(self):
+        for protocol in ('ALL.protocol', 'CERR.protocol', 'OK.protocol'):
+            path = os.path.join(DUMMY_TESTER_DIR, protocol)
+            self.assertEqual(_iterparse_protocol_file(path), _tree_parse_protocol_file(path))
+
+        data = _iterparse_protocol_file(self.protocol_path, max_details_length=4)
+        self.assertEqual(data['tests'][1]['details'], 'nas ...')
+        self.assertIsNone(data['tests'][0]['details'])
+
+
+class StorageTests(SubmitPathMixin, SimpleTestCase):
+    def test_compressed_round_trip(self):
+        file_path = os.path.join(self.submit_path, 'submits', 'a', '1.submit')
+        with mock.patch.object(submit_settings, 'SUBMIT_COMPRESSION', 'gzip'):
+            write_chunks_to_file(file_path, [b'int main() ', b'{}'])
+        self.assertEqual(stored_file_path(file_path), file_path + '.gz')
+        with open_file(file_path) as stored:
+            self.assertEqual(stored.read(), b'int main() {}')
+
+        write_chunks_to_file(file_path, [b'plain'])
+        self.assertEqual(stored_file_path(file_path), file_path)
+        self.assertFalse(os.path.exists(file_path + '.gz'))
+
+    def test_write_is_atomic(self):
+        file_path = os.path.join(self.submit_path, '1.protocol')
+        write_chunks_to_file(file_path, [b'<protokol/>'])
+
+        def chunks():
+            yield b'<protokol>'
+            raise IOError('connection reset')
+        with self.assertRaises(IOError):
+            write_chunks_to_file(file_path, chunks())
+        self.assertEqual(os.listdir(self.submit_path), ['1.protocol'])
+        with open_file(file_path) as stored:
+            self.assertEqual(stored.read(), b'<protokol/>')
+
+    def test_compress_existing_files(self):
+        protocol_path = os.path.join(self.submit_path, 'submits', 'a', '1.protocol')
+        os.makedirs(os.path.dirname(protocol_path))
+        shutil.copy(os.path.join(DUMMY_TESTER_DIR, 'ALL.protocol'), protocol_path)
+        data = parse_protocol(protocol_path)
+
+        call_command('compress_submit_files', processes=1, stdout=StringIO())
+        call_command('compress_submit_files', processes=1, stdout=StringIO())
+        self.assertEqual(stored_file_path(protocol_path), protocol_path + '.gz')
+        self.assertTrue(file_exists(protocol_path))
+        self.assertEqual(parse_protocol(protocol_path), data)
+
+
+class TestResultsTests(SubmitFixtureMixin, TestCase):
+    receiver_options = {'send_to_judge': True}
+
+    def setUp(self):
+        super(TestResultsTests, self).setUp()
+        submit = create_submit(user=self.user, receiver=self.receiver)
+        submit.save()
+        self.review = Review.objects.create(submit=submit, score=0, short_response=ReviewResponse.SENT_TO_JUDGE)
+        with open(os.path.join(DUMMY_TESTER_DIR, 'ALL.protocol'), 'rb') as protocol:
+            self.protocol = protocol.read().decode('utf-8')
+
+    def test_receive_protocol_stores_test_results(self):
+        for _ in range(2):
+            response = self.client.post('/submit/receive_protocol/', {
+                'submit_id': self.review.pk, 'protocol': self.protocol,
+            })
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.review.test_results.count(), 18)
+
+        pass_rates = test_pass_rates(self.receiver)
+        self.assertEqual(len(pass_rates), 13)
+        self.assertEqual(pass_rates[0]['pass_rate'], 0)
+        self.assertEqual(pass_rates[-1], {'name': '3.b.in', 'runs': 1, 'passed': 1, 'pass_rate': 1.0})
+        self.assertEqual(test_time_summary(self.receiver, '3.c.in')['max_time'], 2000)
+        self.assertEqual(test_time_distribution(self.receiver, '1.b.in'), [(400, 1)])
+
+    def test_partial_protocol(self):
+        tests = re.findall(r'<test>.*?</test>', self.protocol, re.DOTALL)
+        for i in range(0, 6, 2):
+            response = self.client.post('/submit/receive_protocol/', {
+                'submit_id': self.review.pk, 'protocol': '\n'.join(tests[i:i + 2]), 'partial': 1, 'tests_total': 18,
+            })
+            self.assertEqual(response.status_code, 200)
+        self.review.refresh_from_db()
+        self.assertEqual(self.review.short_response, ReviewResponse.TESTING)
+        self.assertEqual(self.review.verbose_response(), 'Testing: 6/18')
+
+        # only the appended tests are parsed
+        with mock.patch('submit.judge_helpers._parse_protocol', wraps=judge_helpers._parse_protocol) as parse:
+            append_to_file(self.review.partial_protocol_path(), tests[6].encode('utf-8'))
+            data = parse_partial_protocol(self.review.partial_protocol_path())
+            self.assertEqual(parse.call_args[0][0].getvalue(),
+                             ('<protokol><runLog>' + tests[6] + '</runLog></protokol>').encode('utf-8'))
+        self.assertEqual([test['name'] for test in data['tests']][-2:], ['1.d.in', '2.a.in'])
+
+        html = render_to_string('submit/protocol.html', {
+            'review': self.review, 'protocol': data, 'result': JudgeTestResult,
+        })
+        self.assertIn('Testing: 6/18', html)
+        self.assertIn('1.d.in', html)
+
+        self.client.post('/submit/receive_protocol/', {'submit_id': self.review.pk, 'protocol': self.protocol})
+        self.client.post('/submit/receive_protocol/', {
+            'submit_id': self.review.pk, 'protocol': tests[0], 'partial': 1,
+        })
+        self.review.refresh_from_db()
+        self.assertEqual(self.review.short_response, 'WA')
+        self.assertFalse(file_exists(self.review.partial_protocol_path()))
+
+    def test_partial_protocol_received_with_whole_protocol(self):
+        tests = re.findall(r'<test>.*?</test>', self.protocol, re.DOTALL)
+
+        def receive_whole_protocol(*args, **kwargs):
+            Review.objects.filter(pk=self.review.pk).update(short_response='WA')
+            return parse_partial_protocol(*args, **kwargs)
+
+        with mock.patch('submit.judge_helpers.parse_partial_protocol', side_effect=receive_whole_protocol):
+            self.assertIsNone(save_partial_protocol(self.review, tests[0].encode('utf-8'), 18))
+        self.assertFalse(file_exists(self.review.partial_protocol_path()))
+        self.review.refresh_from_db()
+        self.assertEqual(self.review.short_response, 'WA')
+
+    def test_malformed_tests_total(self):
+        tests = re.findall(r'<test>.*?</test>', self.protocol, re.DOTALL)
+        for tests_total in ['many', '-1', '1.5']:
+            response = self.client.post('/submit/receive_protocol/', {
+                'submit_id': self.review.pk, 'protocol': tests[0], 'partial': 1, 'tests_total': tests_total,
+            })
+            self.assertEqual(response.status_code, 400)
+        self.assertFalse(file_exists(self.review.partial_protocol_path()))
+
+    def test_receive_protocols(self):
+        corrupted = Review.objects.create(submit=self.review.submit, score=0,
+                                          short_response=ReviewResponse.SENT_TO_JUDGE)
+        response = self.client.post(reverse('receive_protocols'), json.dumps([
+            {'submit_id': self.review.pk, 'protocol': self.protocol},
+            {'submit_id': corrupted.pk, 'protocol': '<protokol><runLog>'},
+            {'submit_id': 0, 'protocol': self.protocol},
+        ]), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['status'] for item in response.json()], ['ok', 'corrupted', 'not_found'])
+
+        self.review.refresh_from_db()
+        self.assertEqual(self.review.short_response, 'WA')
+        self.assertEqual(self.review.score, 20)
+        self.assertEqual(self.review.test_results.count(), 18)
+        self.assertEqual(Review.objects.get(pk=corrupted.pk).short_response, ReviewResponse.PROTOCOL_CORRUPTED)
+        self.assertTrue(corrupted.protocol_exists())
+
+
+class BackfillTestResultsTests(SubmitFixtureMixin, TransactionTestCase):
+    receiver_options = {'send_to_judge': True}
+
+    def setUp(self):
+        super(BackfillTestResultsTests, self).setUp()
+        self.review = Review.objects.create(submit=self._create_submit(), score=0, short_response='WA')
+        with open(os.path.join(DUMMY_TESTER_DIR, 'ALL.protocol'), 'rb') as protocol:
+            write_chunks_to_file(self.review.protocol_path(), [protocol.read()])
+
+    def test_backfill(self):
+        # Workers are forked, the connection of the main process stays open (e.g. in the transaction of the caller)
+        with transaction.atomic(), mock.patch.object(connection, 'close') as close:
+            call_command('backfill_test_results', processes=2, stdout=StringIO())
+            self.assertEqual(ReviewTestResult.objects.filter(review=self.review).count(), 18)
+        self.assertFalse(close.called)
+        call_command('backfill_test_results', processes=2, stdout=StringIO())
+        self.assertEqual(ReviewTestResult.objects.filter(review=self.review).count(), 18)
+
+    def test_workers_drop_inherited_connections(self):
+        inherited = connections['default']
+        with mock.patch.object(connections, '_connections', connections._connections):
+            with mock.patch.object(inherited, 'close') as close:
+                backfill_test_results._drop_inherited_connections()
+                self.assertIsNot(connections['default'], inherited)
+            self.assertFalse(close.called)
+
+
+class SubmitFilesTests(SubmitFixtureMixin, TransactionTestCase):
+    def _create_submit(self, content):
+        return super(SubmitFilesTests, self)._create_submit(content, filename='solution.cpp')
+
+    @mock.patch.object(submit_settings, 'SUBMIT_DEDUPLICATE_FILES', True)
+    def test_equal_files_are_stored_once(self):
+        first, second = self._create_submit(b'int main() {}'), self._create_submit(b'int main() {}')
+        other = self._create_submit(b'int main() { return 1; }')
+        self.assertEqual(first.file_path(), second.file_path())
+        self.assertNotEqual(first.file_path(), other.file_path())
+        self.assertTrue(first.file_path().startswith(os.path.join(self.submit_path, 'blobs')))
+        with open_file(second.file_path()) as submitted_file:
+            self.assertEqual(submitted_file.read(), b'int main() {}')
+
+        first.delete()
+        self.assertTrue(second.file_exists())
+        second.delete()
+        self.assertFalse(os.path.exists(first.file_path()))
+        self.assertTrue(other.file_exists())
+
+    @mock.patch.object(submit_settings, 'SUBMIT_DEDUPLICATE_FILES', True)
+    def test_blob_removed_concurrently(self):
+        path = self._create_submit(b'int main() {}').file_path()
+        # The blob gets used after the first check
+        used = iter([False, True])
+        remove_unused_file(path, lambda: next(used))
+        self.assertTrue(file_exists(path))
+        used = iter([False, False])
+        remove_unused_file(path, lambda: next(used))
+        self.assertFalse(file_exists(path))
+
+        # The blob found by `write_blob` is removed before file_hash of the new submit is committed
+        written = []
+
+        def write_blob_removed_concurrently(chunks):
+            file_hash = write_blob(chunks)
+            if not written:
+                remove_file(blob_path(file_hash))
+            written.append(file_hash)
+            return file_hash
+
+        with mock.patch('submit.submit_helpers.write_blob', side_effect=write_blob_removed_concurrently):
+            submit = self._create_submit(b'int main() {}')
+        self.assertEqual(len(written), 2)
+        with open_file(submit.file_path()) as submitted_file:
+            self.assertEqual(submitted_file.read(), b'int main() {}')
+
+    def test_deduplicate_existing_files(self):
+        submits = [self._create_submit(b'print(42)') for _ in range(3)]
+        call_command('deduplicate_submit_files', stdout=StringIO())
+        call_command('deduplicate_submit_files', stdout=StringIO())
+        blob_paths = set(Submit.objects.get(pk=submit.pk).file_path() for submit in submits)
+        self.assertEqual(len(blob_paths), 1)
+        self.assertTrue(file_exists(blob_paths.pop()))
+        self.assertFalse(any(os.path.exists(submit.file_path()) for submit in submits))
+
+    def test_relayout(self):
+        submits = [self._create_submit(b'print(%d)' % i) for i in range(3)]
+        legacy_paths = [submit.file_path() for submit in submits]
+        with mock.patch.object(submit_settings, 'SUBMIT_DIR_PATH_FUNCTION', 'submit.defaults.sharded_submit_dir_path'):
+            call_command('relayout_submit_files', processes=2, stdout=StringIO())
+            call_command('relayout_submit_files', processes=2, stdout=StringIO())
+            for submit in submits:
+                self.assertEqual(submit.dir_path(), os.path.join(
+                    self.submit_path, 'sharded', '000', '000', str(submit.pk)))
+                with open_file(submit.file_path()) as submitted_file:
+                    self.assertEqual(submitted_file.read(), b'print(%d)' % (submits.index(submit)))
+        self.assertFalse(any(os.path.exists(path) for path in legacy_paths))
+        self.assertFalse(os.path.exists(os.path.join(self.submit_path, 'submits')))
+
+    def test_pack_receiver(self):
+        submits = [self._create_submit(b'print(%d)' % i) for i in range(3)]
+        review = Review.objects.create(submit=submits[0], score=0, short_response=ReviewResponse.SENT_TO_JUDGE)
+        with open(os.path.join(DUMMY_TESTER_DIR, 'ALL.protocol'), 'rb') as protocol, \
+                mock.patch.object(submit_settings, 'SUBMIT_COMPRESSION', 'gzip'):
+            save_protocol(review.protocol_path(), protocol.read())
+        call_command('pack_submit_files', self.receiver.pk, stdout=StringIO())
+        self.assertFalse(PackedFile.objects.exists())
+
+        Review.objects.filter(pk=review.pk).update(short_response='WA')
+        call_command('pack_submit_files', self.receiver.pk, stdout=StringIO())
+        call_command('pack_submit_files', self.receiver.pk, stdout=StringIO())
+        self.assertEqual(PackedFile.objects.count(), 4)
+        self.assertEqual(len(set(PackedFile.objects.values_list('archive', flat=True))), 1)
+        self.assertFalse(os.path.exists(os.path.join(self.submit_path, 'submits')))
+
+        for i, submit in enumerate(submits):
+            self.assertTrue(submit.file_exists())
+            with open_file(submit.file_path()) as submitted_file:
+                self.assertEqual(submitted_file.read(), b'print(%d)' % i)
+        response = send_file(RequestFactory().get('/'), submits[1].file_path(), 'solution.cpp')
+        self.assertEqual(b''.join(response.streaming_content), b'print(1)')
+        self.assertEqual(parse_protocol(review.protocol_path())['final_result'], 'WA')
+        with open_file(submits[2].file_path()) as submitted_file:
+            submitted_file.seek(-2, os.SEEK_END)
+            self.assertEqual(submitted_file.read(), b'2)')
+
+        with mock.patch.object(submit_settings, 'SUBMIT_DIR_PATH_FUNCTION', 'submit.defaults.sharded_submit_dir_path'):
+            call_command('relayout_submit_files', processes=1, stdout=StringIO())
+            self.assertEqual(parse_protocol(review.protocol_path())['final_result'], 'WA')
+            remove_file(submits[0].file_path())
+            self.assertFalse(submits[0].file_exists())
+            self.assertEqual(PackedFile.objects.count(), 3)
+
+    @mock.patch.object(submit_settings, 'SUBMIT_DEDUPLICATE_FILES', True)
+    def test_pack_deduplicated_submits(self):
+        submits = [self._create_submit(b'int main() {}') for _ in range(3)]
+        submits.append(self._create_submit(b'int main() { return 1; }'))
+        call_command('pack_submit_files', self.receiver.pk, stdout=StringIO())
+        self.assertEqual(PackedFile.objects.count(), 2)
+        for submit in submits:
+            with open_file(submit.file_path()) as submitted_file:
+                self.assertTrue(submitted_file.read().startswith(b'int main()'))
+
+    def test_pack_file_listed_more_times(self):
+        submit = self._create_submit(b'int main() {}')
+        archive_path = os.path.join(self.submit_path, 'archives', 'test.pack')
+        self.assertEqual(pack_files(archive_path, [submit.file_path()] * 2), 1)
+        with open_file(submit.file_path()) as submitted_file:
+            self.assertEqual(submitted_file.read(), b'int main() {}')
+
+    def test_archive_removed_when_not_indexed(self):
+        submit = self._create_submit(b'int main() {}')
+        archive_path = os.path.join(self.submit_path, 'archives', 'test.pack')
+        with mock.patch.object(PackedFile.objects, 'bulk_create', side_effect=IntegrityError):
+            with self.assertRaises(IntegrityError):
+                pack_files(archive_path, [submit.file_path()])
+        self.assertFalse(os.path.exists(archive_path))
+        self.assertFalse(PackedFile.objects.exists())
+        with open_file(submit.file_path()) as submitted_file:
+            self.assertEqual(submitted_file.read(), b'int main() {}')
+
+
+class InMemoryStorage(Storage):
+    """
+    Stand-in for an object store: files are kept in memory and have no local path.
+    """
+    def __init__(self):
+        self.files = {}
+
+    def _open(self, name, mode='rb'):
+        return ContentFile(self.files[name][0], name=name)
+
+    def _save(self, name, content):
+        self.files[name] = (b''.join(content.chunks()), timezone.now())
+        return name
+
+    def delete(self, name):
+        del self.files[name]
+
+    def exists(self, name):
+        return name in self.files
+
+    def size(self, name):
+        return len(self.files[name][0])
+
+    def get_modified_time(self, name):
+        return self.files[name][1]
+
+
+class RemoteStorageTests(SubmitFixtureMixin, TestCase):
+    receiver_options = {'send_to_judge': True}
+
+    def setUp(self):
+        patcher = mock.patch.object(submit_settings, 'SUBMIT_STORAGE', 'example.tests.InMemoryStorage')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        super(RemoteStorageTests, self).setUp()
+        self.submit = self._create_submit()
+        self.review = Review.objects.create(submit=self.submit, score=0, short_response=ReviewResponse.SENT_TO_JUDGE)
+
+    def test_files_are_stored_in_storage(self):
+        self.assertEqual(os.listdir(self.submit_path), [])
+        self.assertTrue(self.submit.file_exists())
+        self.assertIn(storage_name(self.submit.file_path()), get_storage().files)
+
+        response = send_file(RequestFactory().get('/'), self.submit.file_path(), 'solution.py')
+        self.assertTrue(response.streaming)
+        self.assertEqual(b''.join(response.streaming_content), b'print(42)')
+
+    @mock.patch.object(submit_settings, 'SUBMIT_COMPRESSION', 'gzip')
+    def test_protocols(self):
+        with open(os.path.join(DUMMY_TESTER_DIR, 'ALL.protocol'), 'rb') as protocol:
+            save_protocol(self.review.protocol_path(), protocol.read())
+        self.assertEqual(stored_file_path(self.review.protocol_path()), self.review.protocol_path() + '.gz')
+        with mock.patch('submit.judge_helpers._parse_protocol_file', wraps=judge_helpers._parse_protocol_file) as parse:
+            self.assertEqual(parse_protocol(self.review.protocol_path())['final_result'], 'WA')
+            self.assertFalse(parse.called)
+
+        for name, result in (('1.a.in', 'OK'), ('1.b.in', 'WA')):
+            append_to_file(self.review.partial_protocol_path(), (
+                '<test><name>%s</name><resultCode/><resultMsg>%s</resultMsg><time>1</time></test>' % (name, result)
+            ).encode('utf-8'))
+        data = parse_partial_protocol(self.review.partial_protocol_path())
+        self.assertEqual([test['result'] for test in data['tests']], ['OK', 'WA'])
+        self.assertEqual(os.listdir(self.submit_path), [])
+
+    def test_pending_review_has_no_protocol_lookup(self):
+        self.client.login(username='jozko', password='pass')
+        with mock.patch.object(Review, 'protocol_exists') as protocol_exists:
+            response = self.client.get(reverse('view_submit', kwargs={'submit_id': self.submit.pk}))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(protocol_exists.called)
+
+    @mock.patch.object(submit_settings, 'SUBMIT_DEDUPLICATE_FILES', True)
+    def test_blobs(self):
+        first, second = self._create_submit(), self._create_submit()
+        self.assertEqual(first.file_path(), second.file_path())
+        self.assertTrue(files_equal(first.file_path(), self.submit.file_path()))
+        self.assertEqual(os.listdir(self.submit_path), [])
+
+
+class LastReviewTests(SubmitFixtureMixin, TestCase):
+    def setUp(self):
+        super(LastReviewTests, self).setUp()
+        self.submit = self._create_submit()
+
+    def test_last_review_is_kept_up_to_date(self):
+        self.assertIsNone(Submit.objects.get(pk=self.submit.pk).last_review)
+        first = Review.objects.create(submit=self.submit, score=0, short_response='WA')
+        second = Review.objects.create(submit=self.submit, score=100, short_response='OK')
+        self.assertEqual(Submit.objects.get(pk=self.submit.pk).last_review, second)
+
+        first.score = 50
+        first.save()
+        self.assertEqual(Submit.objects.get(pk=self.submit.pk).last_review, second)
+        first.time = timezone.now() + datetime.timedelta(minutes=1)
+        first.save()
+        self.assertEqual(Submit.objects.get(pk=self.submit.pk).last_review, first)
+
+        first.delete()
+        self.assertEqual(Submit.objects.get(pk=self.submit.pk).last_review, second)
+        self.submit.delete()
+        self.assertFalse(Review.objects.exists())
+
+    def test_stale_submit_does_not_change_last_review(self):
+        Review.objects.create(submit=self.submit, score=0, short_response='WA')
+        stale = Submit.objects.get(pk=self.submit.pk)
+        second = Review.objects.create(submit=self.submit, score=100, short_response='OK')
+        stale.is_accepted = Submit.NOT_ACCEPTED
+        stale.save()
+        submit = Submit.objects.get(pk=self.submit.pk)
+        self.assertEqual(submit.last_review, second)
+        self.assertEqual(submit.is_accepted, Submit.NOT_ACCEPTED)
+
+    def test_update_last_reviews(self):
+        submits = [self._create_submit() for _ in range(3)]
+        reviews = [Review.objects.create(submit=submit, score=0, short_response='WA') for submit in submits]
+        reviews += [Review.objects.create(submit=submit, score=100, short_response='OK') for submit in submits[:2]]
+        self.assertEqual(set(Review.objects.last_reviews(Submit.objects.all())), set(reviews[2:]))
+
+        # Queryset updates bypass Review.save
+        Review.objects.filter(pk=reviews[0].pk).update(time=timezone.now() + datetime.timedelta(minutes=1))
+        self.assertEqual(Submit.objects.get(pk=submits[0].pk).last_review, reviews[3])
+        out = StringIO()
+        call_command('update_last_reviews', check=True, stdout=out)
+        self.assertIn('1 submits', out.getvalue())
+        call_command('update_last_reviews', receiver=[self.receiver.pk], stdout=StringIO())
+        self.assertEqual(Submit.objects.get(pk=submits[0].pk).last_review, reviews[0])
+        self.assertEqual(Submit.objects.get(pk=submits[1].pk).last_review, reviews[4])
+
+    def test_submit_list(self):
+        for _ in range(3):
+            submit = self._create_submit()
+            Review.objects.create(submit=submit, score=0, short_response='WA')
+            Review.objects.create(submit=submit, score=100, short_response='OK')
+
+        # submits, their last reviews and receivers prefetched for score calculation
+        with self.assertNumQueries(3):
+            reviews = [submit.last_review for submit in Submit.with_reviews.filter(receiver=self.receiver)]
+        self.assertEqual([review.short_response if review else None for review in reviews], [None, 'OK', 'OK', 'OK'])
+
+        html = render_to_string('submit/parts/submit_list.html',
+                                submit_list(self.receiver, self.user))
+        self.assertEqual(html.count('<tr class="info">'), 1)
+        self.assertEqual(html.count('success'), 3)
+
+    @mock.patch.object(submit_settings, 'SUBMIT_LIST_PAGE_SIZE', 2)
+    def test_submit_list_pages(self):
+        submits = [self.submit] + [self._create_submit() for _ in range(4)]
+        for submit in submits:
+            Review.objects.create(submit=submit, score=100, short_response='OK')
+        # Submits with equal times are ordered by pk
+        Submit.objects.filter(pk__in=[submit.pk for submit in submits[1:4]]).update(time=self.submit.time)
+        expected = [submits[4].pk, submits[3].pk, submits[2].pk, submits[1].pk, submits[0].pk]
+
+        pks, cursor = [], None
+        for _ in range(3):
+            # submits of the page, their last reviews and receivers prefetched for score calculation
+            with self.assertNumQueries(3):
+                page, cursor = get_submit_list_page(self.receiver, self.user, cursor)
+                self.assertTrue(all(submit.last_review for submit in page))
+            pks += [submit.pk for submit in page]
+        self.assertIsNone(cursor)
+        self.assertEqual(pks, expected)
+
+        html = render_to_string('submit/parts/submit_list.html', submit_list(self.receiver, self.user))
+        self.assertEqual(html.count('success'), 2)
+        self.assertIn('submitListLoadMore', html)
+
+        self.client.login(username='jozko', password='pass')
+        url = reverse('submit_list_page', kwargs={'receiver_id': self.receiver.pk})
+        page, cursor = get_submit_list_page(self.receiver, self.user)
+        response = self.client.get(url, {'after': cursor})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content.decode('utf-8').count('success'), 2)
+        self.assertIn('submit-list-more', response.content.decode('utf-8'))
+        self.assertIn('?user=%d&amp;after=' % self.user.pk, response.content.decode('utf-8'))
+        self.assertEqual(self.client.get(url, {'after': 'yesterday_1'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'user': 'me'}).status_code, 400)
+
+        # Only admins page over submits of other users
+        other = get_user_model().objects.create_user(username='ferko', password='pass')
+        self.client.login(username='ferko', password='pass')
+        self.assertEqual(self.client.get(url, {'user': self.user.pk, 'after': cursor}).status_code, 403)
+        self.assertNotIn('success', self.client.get(url, {'after': cursor}).content.decode('utf-8'))
+        get_user_model().objects.filter(pk=other.pk).update(is_staff=True)
+        response = self.client.get(url, {'user': self.user.pk, 'after': cursor})
+        self.assertEqual(response.content.decode('utf-8').count('success'), 2)
+
+
+class UserReceiverScoreTests(SubmitFixtureMixin, TestCase):
+    def _create_reviewed_submit(self, score, is_accepted=Submit.ACCEPTED):
+        submit = self._create_submit()
+        Submit.objects.filter(pk=submit.pk).update(is_accepted=is_accepted)
+        return Review.objects.create(submit=submit, score=score, short_response='OK')
+
+    def _score(self):
+        score = UserReceiverScore.objects.filter(user=self.user, receiver=self.receiver).first()
+        return score.score if score is not None else None
+
+    def test_aggregations(self):
+        self._create_reviewed_submit(100)
+        self._create_reviewed_submit(50)
+        self._create_reviewed_submit(300, is_accepted=Submit.ACCEPTED_WITH_PENALIZATION)
+        self.assertEqual(self._score(), 50)
+
+        for aggregation, score in (('max', 100), ('max_with_penalization', 150), ('last_accepted', 50)):
+            with mock.patch.object(submit_settings, 'SUBMIT_USER_RECEIVER_SCORE_AGGREGATION', aggregation):
+                out = StringIO()
+                call_command('rebuild_user_receiver_scores', check=True, stdout=out)
+                self.assertIn('%d of 1' % (score != self._score()), out.getvalue())
+                call_command('rebuild_user_receiver_scores', receiver=[self.receiver.pk], stdout=StringIO())
+                self.assertEqual(self._score(), score)
+
+    def test_score_is_kept_up_to_date(self):
+        first = self._create_reviewed_submit(100)
+        second = self._create_reviewed_submit(40)
+        self.assertEqual(self._score(), 40)
+
+        # Rejudge does not change the score until the new review is finished
+        rejudge = Review.objects.create(submit=second.submit, score=0, short_response=ReviewResponse.SENT_TO_JUDGE)
+        self.assertEqual(self._score(), 40)
+        save_protocols([(rejudge.pk, b'<protokol><runLog><score>70</score></runLog></protokol>')])
+        self.assertEqual(self._score(), 70)
+
+        submit = Submit.objects.get(pk=second.submit.pk)
+        submit.is_accepted = Submit.NOT_ACCEPTED
+        submit.save()
+        self.assertEqual(self._score(), 100)
+
+        first.delete()
+        self.assertIsNone(self._score())
+        submit.is_accepted = Submit.ACCEPTED
+        submit.save()
+        self.assertEqual(self._score(), 70)
+        submit.delete()
+        self.assertFalse(UserReceiverScore.objects.exists())
+
+
+class ScoreboardTests(SubmitPathMixin, TransactionTestCase):
+    def setUp(self):
+        super(ScoreboardTests, self).setUp()
+        caches[submit_settings.SUBMIT_SCOREBOARD_CACHE].clear()
+        scoreboard_helpers._memo.clear()
+        self.users = [get_user_model().objects.create_user(username=username, password='pass')
+                      for username in ('jozko', 'janko')]
+        self.tasks = [Task.objects.create(name='Task %d' % i, slug='task%d' % i, visible=True, max_points=10,
+                                          deadline=timezone.now() + datetime.timedelta(weeks=2)) for i in range(2)]
+        self.receivers = [SubmitReceiver.objects.create(task=task) for task in self.tasks]
+
+    def _review(self, user, receiver, score):
+        submit = create_submit(user=user, receiver=receiver, sfile=SimpleUploadedFile('solution.py', b'print(42)'))
+        return Review.objects.create(submit=submit, score=score, short_response='OK')
+
+    @mock.patch.object(submit_settings, 'SUBMIT_SCOREBOARD_CHECK_INTERVAL', 0)
+    def test_scoreboard(self):
+        self._review(self.users[0], self.receivers[0], 50)
+        self._review(self.users[1], self.receivers[0], 30)
+        self._review(self.users[1], self.receivers[1], 100)
+        task_ids = [task.pk for task in self.tasks]
+        self.assertEqual([(row['user'], row['tasks'], row['total']) for row in get_scoreboard(task_ids)], [
+            ('janko', {'task0': 3, 'task1': 10}, 13),
+            ('jozko', {'task0': 5}, 5),
+        ])
+        self.assertEqual([row['user'] for row in get_scoreboard(task_ids[:1])], ['jozko', 'janko'])
+
+        # A new score patches the cached column of its task, only the score of the user is computed
+        with mock.patch('submit.scoreboard_helpers.compute_column', wraps=scoreboard_helpers.compute_column) as compute:
+            get_scoreboard(task_ids)
+            self.assertFalse(compute.called)
+            self._review(self.users[0], self.receivers[1], 100)
+            self.assertEqual([row['total'] for row in get_scoreboard(task_ids)], [15, 13])
+            self.assertEqual([call[0] for call in compute.call_args_list], [('task1', self.users[0].pk)])
+        self.assertEqual(scoreboard_helpers.compute_scoreboard(task_ids), get_scoreboard(task_ids))
+
+        self.client.login(username='jozko', password='pass')
+        response = self.client.get(reverse('scoreboard'), {'tasks': ','.join(task_ids)})
+        self.assertEqual([(row['user'], row['total']) for row in response.json()['rows']],
+                         [('jozko', '15.00'), ('janko', '13.00')])
+
+    @mock.patch.object(submit_settings, 'SUBMIT_SCOREBOARD_CHECK_INTERVAL', 0)
+    def test_concurrent_updates(self):
+        self._review(self.users[0], self.receivers[0], 50)
+        self._review(self.users[1], self.receivers[0], 10)
+        task_ids = [self.tasks[0].pk]
+        get_scoreboard(task_ids)
+
+        # A new score of the other user arrives while the column is being patched
+        compute_column = scoreboard_helpers.compute_column
+
+        def concurrent_review(task_id, user_id=None):
+            if user_id == self.users[0].pk:
+                self._review(self.users[1], self.receivers[0], 90)
+            return compute_column(task_id, user_id)
+
+        with mock.patch('submit.scoreboard_helpers.compute_column', side_effect=concurrent_review):
+            self._review(self.users[0], self.receivers[0], 60)
+        self.assertEqual([(row['user'], row['total']) for row in get_scoreboard(task_ids)],
+                         [('janko', 9), ('jozko', 6)])
+
+    def test_view_permissions(self):
+        url = reverse('scoreboard')
+        self.client.login(username='jozko', password='pass')
+        self.assertEqual(self.client.get(url, {'tasks': 'task0,task1'}).status_code, 200)
+        self.tasks[1].visible = False
+        self.tasks[1].save()
+        self.assertEqual(self.client.get(url, {'tasks': 'task0,task1'}).status_code, 403)
+        self.assertEqual(self.client.get(url, {'tasks': 'task0,unknown'}).status_code, 403)
+
+    def test_reads_are_served_by_the_process(self):
+        self._review(self.users[0], self.receivers[0], 50)
+        get_scoreboard([self.tasks[0].pk])
+        with mock.patch('submit.scoreboard_helpers._versions') as versions, self.assertNumQueries(0):
+            self.assertEqual(get_scoreboard([self.tasks[0].pk])[0]['total'], 5)
+        self.assertFalse(versions.called)
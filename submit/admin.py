@@ -5,7 +5,7 @@ from django.utils.safestring import mark_safe
 from django.utils.translation import ugettext_lazy as _
 
 from submit import settings as submit_settings
-from submit.models import Review, Submit, SubmitReceiver
+from submit.models import RejudgeJob, Review, Submit, SubmitReceiver
 
 
 class SubmitReceiverAdminForm(forms.ModelForm):
@@ -45,7 +45,7 @@ class SubmitReceiverAdmin(admin.ModelAdmin):
             'fields': ('external_link', ('allow_external_submits', 'regenerate_token'), 'token'),
         }),
         ('Judge options', {
-            'fields': ('send_to_judge', 'inputs_folder_at_judge'),
+            'fields': ('send_to_judge', 'inputs_folder_at_judge', 'skip_identical_resubmits'),
         }),
         ('Submit page options', {
             'fields': ('show_all_details', 'show_submitted_file'),
@@ -154,5 +154,21 @@ class SubmitAdmin(ViewOnSiteMixin, admin.ModelAdmin):
         return review.display_score() if review is not None else ''
 
 
+class RejudgeJobAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'receiver', 'created_by', 'created', 'status', 'total', 'done', 'failed', 'pending')
+    list_filter = ('status',)
+    readonly_fields = ('created_by', 'created', 'status', 'total', 'done', 'failed', 'last_submit_id')
+    actions = ['pause', 'resume']
+
+    def pause(self, request, queryset):
+        queryset.filter(status__in=[RejudgeJob.PENDING, RejudgeJob.RUNNING]).update(status=RejudgeJob.PAUSED)
+    pause.short_description = _('Pause selected rejudge jobs')
+
+    def resume(self, request, queryset):
+        queryset.filter(status=RejudgeJob.PAUSED).update(status=RejudgeJob.PENDING)
+    resume.short_description = _('Resume selected rejudge jobs')
+
+
 admin.site.register(SubmitReceiver, SubmitReceiverAdmin)
 admin.site.register(Submit, SubmitAdmin)
+admin.site.register(RejudgeJob, RejudgeJobAdmin)
@@ -1,12 +1,15 @@
 from django.contrib import messages
 from django.core.exceptions import PermissionDenied
 from django.http import Http404
-from django.shortcuts import get_object_or_404, redirect
+from django.shortcuts import get_object_or_404, redirect, render
 from django.utils.translation import ugettext_lazy as _
 
+from submit.constants import JudgePriority
+from submit.forms import RejudgeJobForm
 from submit.judge_helpers import (JudgeConnectionError,
                                   create_review_and_send_to_judge)
 from submit.models import Submit, SubmitReceiver
+from submit.rejudge_helpers import start_rejudge_job
 
 
 def rejudge_submit(request, submit_id):
@@ -19,7 +22,7 @@ def rejudge_submit(request, submit_id):
         raise Http404
 
     try:
-        create_review_and_send_to_judge(submit)
+        create_review_and_send_to_judge(submit, priority=JudgePriority.MEDIUM, force=True)
         messages.add_message(request, messages.SUCCESS, _('Resubmit successful.'))
     except JudgeConnectionError:
         messages.add_message(request, messages.ERROR, _('Resubmit not successful. Judge unavailable.'))
@@ -30,6 +33,7 @@ def rejudge_submit(request, submit_id):
 def rejudge_receiver_submits(request, receiver_id):
     """
     For selected receiver send each accepted (acc. with penalization) submit of each user to judge.
+    After a confirmation, a RejudgeJob is created and the submits are sent by `manage.py run_rejudge_jobs`.
     """
     receiver = get_object_or_404(SubmitReceiver, pk=receiver_id)
 
@@ -39,20 +43,15 @@ def rejudge_receiver_submits(request, receiver_id):
     if not receiver.send_to_judge:
         raise Http404
 
-    submits = Submit.objects\
-        .filter(receiver__id=receiver_id, is_accepted__in=[Submit.ACCEPTED, Submit.ACCEPTED_WITH_PENALIZATION])\
-        .order_by('time', 'pk')
-
-    failed_submits = []
-    for submit in submits:
-        try:
-            create_review_and_send_to_judge(submit)
-        except:
-            failed_submits.append(submit)
-
-    if failed_submits:
-        messages.add_message(request, messages.ERROR, u"{}: {}".format(_('Failed submits'), map(str, failed_submits)))
-    else:
-        messages.add_message(request, messages.SUCCESS, _('Everything OK'))
-
-    return redirect('/')
+    form = RejudgeJobForm(request.POST or None)
+    if request.method == 'POST' and form.is_valid():
+        job = start_rejudge_job(receiver, request.user, **form.cleaned_data)
+        messages.add_message(request, messages.SUCCESS,
+                             _('Rejudge of %(count)d submits was scheduled.') % {'count': job.total})
+        return redirect(receiver.task.get_absolute_url())
+
+    return render(request, 'submit/rejudge_receiver.html', {
+        'receiver': receiver,
+        'form': form,
+        'jobs': receiver.rejudgejob_set.order_by('-created')[:5],
+    })
@@ -5,6 +5,16 @@ SUBMITTED_FILE_EXTENSION = '.submit'
 REVIEWED_FILE_EXTENSION = '.review'
 TESTING_PROTOCOL_EXTENSION = '.protocol'
 TESTING_RAW_EXTENSION = '.raw'
+TESTING_PARTIAL_PROTOCOL_EXTENSION = '.partial'
+
+# Compressed files are stored with an additional extension
+COMPRESSION_EXTENSIONS = {
+    'gzip': '.gz',
+    'zstd': '.zst',
+}
+
+# Files are read and sent in chunks of this size
+FILE_CHUNK_SIZE = 64 * 1024
 
 # DB can hold names with length up to 128, some space is reserved for extension mapping
 SUBMIT_UPLOADED_FILENAME_MAXLENGTH = 120
@@ -46,15 +56,22 @@ class ReviewResponse(JudgeTestResult):
 
     SENDING_TO_JUDGE = 'Sending to judge'
     SENT_TO_JUDGE = 'Sent to judge'
+    TESTING = 'Testing'
     JUDGE_UNAVAILABLE = 'Judge unavailable'
+    SUBMIT_FILE_UNAVAILABLE = 'Submit file unavailable'
     PROTOCOL_CORRUPTED = 'Protocol corrupted'
     REVIEWED = 'Reviewed'
 
+    # Reviews waiting for judge, their score is not final
+    PENDING = (SENDING_TO_JUDGE, SENT_TO_JUDGE, TESTING, JUDGE_UNAVAILABLE)
+
     VERBOSE_RESPONSE = {
         # strings are as literals here so `manage.py makemessages` will include them into django.po file
         SENDING_TO_JUDGE: _('Sending to judge'),
         SENT_TO_JUDGE: _('Sent to judge'),
+        TESTING: _('Testing'),
         JUDGE_UNAVAILABLE: _('Judge unavailable'),
+        SUBMIT_FILE_UNAVAILABLE: _('Submit file unavailable'),
         PROTOCOL_CORRUPTED: _('Protocol corrupted'),
         REVIEWED: _('Reviewed'),
     }
@@ -79,6 +96,21 @@ class ReviewResponse(JudgeTestResult):
 
         return choices
 
+
+class JudgePriority(object):
+    """
+    Reviews queued for judge are dispatched from the highest priority lane first.
+    """
+    HIGH = 0
+    MEDIUM = 1
+    LOW = 2
+
+    CHOICES = [
+        (HIGH, _('high (submit)')),
+        (MEDIUM, _('medium (rejudge of one submit)')),
+        (LOW, _('low (bulk rejudge)')),
+    ]
+
 DEDUCE_LANGUAGE_AUTOMATICALLY_OPTION = '.'
 DEDUCE_LANGUAGE_AUTOMATICALLY_VERBOSE = _('Deduce from extension')
 
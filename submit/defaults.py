@@ -1,3 +1,5 @@
+import os
+
 from django.core.urlresolvers import reverse
 from django.utils.html import format_html
 from django.utils.translation import ugettext_lazy as _
@@ -46,6 +48,14 @@ def display_score(review):
     return str(review.score)
 
 
+def penalized_score(review):
+    """
+    Score of a review of a submit accepted with penalization, used by `UserReceiverScore`
+    with `SUBMIT_USER_RECEIVER_SCORE_AGGREGATION = 'max_with_penalization'`. By default a half of `review.score`.
+    """
+    return review.score / 2
+
+
 def render_review_comment(review):
     """
     Allows tweaks such as markdown rendering.
@@ -96,3 +106,29 @@ def has_admin_privileges_for_receiver(receiver, user):
     e.g. an organizator of specific competition can access all submits of all users in this competition
     """
     return user.is_staff
+
+
+def can_view_scoreboard(task_ids, user):
+    """
+    Defines who can view the scoreboard (view `scoreboard`) of tasks with these ids.
+    e.g. contestants may see scoreboards of visible tasks only
+    """
+    return user.is_staff
+
+
+def submit_dir_path(submit):
+    """
+    Defines where files of the submit are stored, relative to `SUBMIT_PATH`.
+    By default there is a directory for each user, receiver and submit: submits/<user_id>/<receiver_id>/<submit_id>
+    Only ids of the submit are available, the function must not use the database.
+    """
+    return os.path.join('submits', str(submit.user_id), str(submit.receiver_id), str(submit.id))
+
+
+def sharded_submit_dir_path(submit):
+    """
+    Alternative to `submit_dir_path`, submits are bucketed by id: sharded/<id // 10^6>/<id // 1000 % 1000>/<id>
+    so no directory has more than 1000 entries, however many submits one user has.
+    """
+    return os.path.join('sharded', '%03d' % (submit.id // 1000000), '%03d' % (submit.id // 1000 % 1000),
+                        str(submit.id))
@@ -4,6 +4,7 @@ from django import forms
 from django.utils.translation import ugettext_lazy as _
 
 from submit import constants
+from submit.models import RejudgeJob
 from submit.submit_helpers import add_language_preference_to_filename
 
 
@@ -77,6 +78,18 @@ class CodeSubmitForm(BaseSubmitForm):
         return cleaned_data
 
 
+class RejudgeJobForm(forms.ModelForm):
+    class Meta:
+        model = RejudgeJob
+        fields = ('only_latest', 'submits_per_second')
+
+    def clean_submits_per_second(self):
+        submits_per_second = self.cleaned_data['submits_per_second']
+        if submits_per_second <= 0:
+            raise forms.ValidationError(_('Rate must be positive.'), code='invalid rate')
+        return submits_per_second
+
+
 def submit_form_factory(*args, **kwargs):
     receiver = kwargs.pop('receiver')
 
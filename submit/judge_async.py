@@ -0,0 +1,118 @@
+import asyncio
+import socket
+
+from submit import settings as submit_settings
+from submit.constants import FILE_CHUNK_SIZE
+from submit.judge_helpers import (JudgeConnectionError, SubmitFileError,
+                                  _claim_review, _mark_review_sent,
+                                  _open_submitted_file, _prepare_raw_head,
+                                  _release_review, _write_raw_file,
+                                  reviews_in_flight)
+from submit.judge_pool import get_judge_pool
+
+# asyncio client for judge used by `manage.py dispatch_to_judge --concurrency N`, requires Python 3.5+.
+# Judge reads one submit per connection until the connection is closed,
+# so throughput comes from many concurrent connections rather than from reusing one.
+
+
+def send_reviews_to_judge(reviews, concurrency):
+    """
+    Sends queued reviews to judge from one process, at most `concurrency` of them at once.
+    Reviews are claimed and assigned to endpoints up front, taking `JUDGE_MAX_IN_FLIGHT` into account;
+    when judge is busy, the remaining reviews stay queued. Returns the number of processed reviews.
+    """
+    pool = get_judge_pool()
+    in_flight = reviews_in_flight() if pool.max_in_flight is not None else {}
+
+    processed = 0
+    assigned = []
+    for review in reviews:
+        # There is always an endpoint to try (see `JudgePool.candidates`), unless all of them are full
+        candidates = pool.candidates(in_flight)
+        if not candidates:
+            break
+        if not _claim_review(review):
+            continue
+        processed += 1
+
+        raw_head = _prepare_raw_head(review)
+        if submit_settings.JUDGE_WRITE_RAW_FILE:
+            try:
+                _write_raw_file(review, raw_head)
+            except SubmitFileError as error:
+                _release_review(review, error)
+                continue
+        endpoint_name = str(candidates[0])
+        in_flight[endpoint_name] = in_flight.get(endpoint_name, 0) + 1
+        assigned.append((review, raw_head, candidates))
+
+    loop = asyncio.new_event_loop()
+    try:
+        results = loop.run_until_complete(_send_all(pool, assigned, concurrency))
+    finally:
+        loop.close()
+
+    for (review, raw_head, candidates), result in zip(assigned, results):
+        if isinstance(result, SubmitFileError):
+            _release_review(review, result)
+        elif result is None:
+            _release_review(review, JudgeConnectionError())
+        else:
+            _mark_review_sent(review, result)
+    return processed
+
+
+async def _send_all(pool, assigned, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(review, raw_head, candidates):
+        async with semaphore:
+            return await _send_to_any(pool, review, raw_head, candidates)
+
+    return await asyncio.gather(*[send(*assignment) for assignment in assigned])
+
+
+async def _send_to_any(pool, review, raw_head, candidates):
+    """
+    Tries endpoints in order and returns the one that accepted the review, None if none of them did,
+    or SubmitFileError if the submitted file cannot be opened.
+    """
+    for endpoint in candidates:
+        # Skip endpoints which failed during this batch, unless there is no other
+        if not endpoint.in_rotation and pool.in_rotation():
+            continue
+        # The file is opened outside of `pool.sending`, its errors must not take endpoints out of rotation
+        try:
+            submitted_file = _open_submitted_file(review)
+        except SubmitFileError as error:
+            return error
+        try:
+            with submitted_file, pool.sending(endpoint):
+                await _send(endpoint, raw_head, submitted_file, pool.timeout)
+            return endpoint
+        except socket.error:
+            continue
+    return None
+
+
+async def _send(endpoint, raw_head, submitted_file, timeout):
+    """
+    Writes the header and the submitted file to a new connection, every step is limited by `timeout`.
+    The write buffer is disabled, so `drain` returns only when all data was passed to the socket.
+    """
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(endpoint.address, endpoint.port), timeout)
+    except asyncio.TimeoutError:
+        raise socket.timeout()
+
+    try:
+        writer.transport.set_write_buffer_limits(high=0)
+        writer.write(raw_head)
+        for chunk in iter(lambda: submitted_file.read(FILE_CHUNK_SIZE), b''):
+            await asyncio.wait_for(writer.drain(), timeout)
+            writer.write(chunk)
+        await asyncio.wait_for(writer.drain(), timeout)
+    except asyncio.TimeoutError:
+        raise socket.timeout()
+    finally:
+        writer.close()
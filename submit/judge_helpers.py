@@ -1,54 +1,368 @@
+import datetime
+import hashlib
+import io
+import itertools
 import os
+import random
 import socket
 import time
 import xml.etree.ElementTree as ET
 from decimal import Decimal
 
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
 from unidecode import unidecode
 
 from submit import settings as submit_settings
-from submit.constants import JudgeTestResult, ReviewResponse
-from submit.models import Review
-from submit.submit_helpers import write_chunks_to_file
+from submit.constants import FILE_CHUNK_SIZE, JudgePriority, JudgeTestResult, ReviewResponse
+from submit.judge_pool import get_judge_pool
+from submit.models import Review, ReviewTestResult, UserReceiverScore
+from submit.storage import (append_to_file, direct_local_path, file_size, file_version, files_equal, open_file,
+                            remove_file, write_chunks_to_file)
 
 
 class JudgeConnectionError(Exception):
     pass
 
 
-def create_review_and_send_to_judge(submit):
+class JudgeBusyError(Exception):
     """
-    Creates an empty review object, prepares a .raw file (metadata for judge) for submit and sends submit to judge.
+    All available judge endpoints have `JUDGE_MAX_IN_FLIGHT` reviews in testing, the review stays queued.
     """
-    review = Review(submit=submit, score=0, short_response=ReviewResponse.SENDING_TO_JUDGE)
+    pass
+
+
+class SubmitFileError(Exception):
+    """
+    The submitted file (or the .raw copy of data for judge) cannot be read or written,
+    the review fails without affecting judge endpoints and is not retried.
+    """
+    pass
+
+
+def create_review_and_send_to_judge(submit, priority=JudgePriority.HIGH, force=False):
+    """
+    Creates an empty review object and sends submit to judge.
+    When `JUDGE_DISPATCH_IN_BACKGROUND` is set, the review is only queued (it stays in state `SENDING_TO_JUDGE`)
+    and the `dispatch_to_judge` management command sends it later, reviews with higher `priority` first.
+    The review is also left queued when judge is busy.
+
+    If the receiver skips identical resubmits, the review of an earlier identical submit is cloned instead,
+    unless `force` is set.
+    """
+    if not force and submit.receiver.skip_identical_resubmits:
+        identical_review = _identical_judged_review(submit)
+        if identical_review is not None:
+            return _clone_review(identical_review, submit)
+
+    review = Review(submit=submit, score=0, short_response=ReviewResponse.SENDING_TO_JUDGE,
+                    judge_priority=priority, judge_inputs_folder=submit.receiver.inputs_folder_at_judge)
     review.save()
-    _prepare_raw_file(review)
+    if not submit_settings.JUDGE_DISPATCH_IN_BACKGROUND:
+        try:
+            send_review_to_judge(review)
+        except (JudgeBusyError, SubmitFileError):
+            pass
+    return review
+
+
+def _identical_judged_review(submit):
+    """
+    Returns the latest judged review of an earlier submit of the same user with an identical file (and language),
+    tested with the same inputs at judge, or None.
+    Deduplicated files are found by their `file_hash`, other files are compared with files of at most
+    `JUDGE_IDENTICAL_RESUBMITS_MAX_COMPARED` latest earlier submits.
+    """
+    reviews = Review.objects.filter(
+        submit__receiver=submit.receiver_id,
+        submit__user=submit.user_id,
+        submit__pk__lt=submit.pk,
+        judge_inputs_folder=submit.receiver.inputs_folder_at_judge,
+        short_response__in=list(JudgeTestResult.VERBOSE_RESULT),
+    ).select_related('submit__user', 'submit__receiver').order_by('-submit__pk', '-time', '-pk')
+
+    extension = os.path.splitext(submit.filename)[1].lower()
+    if submit.file_hash:
+        for review in reviews.filter(submit__file_hash=submit.file_hash).iterator():
+            if os.path.splitext(review.submit.filename)[1].lower() == extension:
+                return review
+        reviews = reviews.filter(submit__file_hash='')
+
+    compared = set()
+    for review in reviews.iterator():
+        if review.submit_id in compared:
+            continue
+        if len(compared) >= submit_settings.JUDGE_IDENTICAL_RESUBMITS_MAX_COMPARED:
+            break
+        compared.add(review.submit_id)
+        if os.path.splitext(review.submit.filename)[1].lower() != extension:
+            continue
+        if files_equal(submit.file_path(), review.submit.file_path()):
+            return review
+    return None
+
+
+def _clone_review(review, submit):
+    """
+    Copies the review with its protocol and test results to an identical submit.
+    """
+    clone = Review(submit=submit, score=review.score, short_response=review.short_response,
+                   judge_inputs_folder=review.judge_inputs_folder,
+                   tests_done=review.tests_done, tests_total=review.tests_total)
+    clone.save()
+    if review.protocol_exists():
+        with open_file(review.protocol_path()) as protocol:
+            write_chunks_to_file(clone.protocol_path(), iter(lambda: protocol.read(FILE_CHUNK_SIZE), b''))
+    ReviewTestResult.objects.bulk_create([
+        ReviewTestResult(review=clone, receiver_id=test_result.receiver_id, name=test_result.name,
+                         result=test_result.result, time=test_result.time)
+        for test_result in ReviewTestResult.objects.filter(review=review)
+    ])
+    return clone
+
+
+def send_review_to_judge(review, retry=False):
+    """
+    Sends the submit of a queued review to judge, preceded by a header with metadata for judge.
+    The review is claimed by a conditional update first, so one review is never sent twice
+    by concurrent dispatchers. Returns False if the review was not waiting to be sent.
+
+    With `retry`, a review in state `JUDGE_UNAVAILABLE` due for another attempt is sent instead.
+    After a failed attempt the next one is scheduled with exponential backoff.
+    When judge is busy, the review is returned to the queue and JudgeBusyError is raised.
+    When the submitted file cannot be read, the review fails and SubmitFileError is raised.
+    """
+    if not _claim_review(review, retry):
+        return False
     try:
-        _send_to_judge(review)
-        review.short_response = ReviewResponse.SENT_TO_JUDGE
-    except JudgeConnectionError:
-        review.short_response = ReviewResponse.JUDGE_UNAVAILABLE
-        raise JudgeConnectionError
-    finally:
-        review.save()
+        raw_head = _prepare_raw_head(review)
+        if submit_settings.JUDGE_WRITE_RAW_FILE:
+            _write_raw_file(review, raw_head)
+        endpoint = _send_to_judge(review, raw_head)
+    except (JudgeBusyError, JudgeConnectionError, SubmitFileError) as error:
+        _release_review(review, error)
+        raise
+    _mark_review_sent(review, endpoint)
+    return True
+
+
+def _claim_review(review, retry=False):
+    reviews = Review.objects.filter(pk=review.pk)
+    if retry:
+        reviews = reviews.filter(short_response=ReviewResponse.JUDGE_UNAVAILABLE,
+                                 next_judge_attempt__lte=timezone.now())
+    else:
+        reviews = reviews.filter(short_response=ReviewResponse.SENDING_TO_JUDGE)
+    # Until the review is marked as sent, next_judge_attempt is the deadline of the claim. A claim not finished
+    # by then (e.g. the sending process was killed) is requeued by `requeue_stale_claims`.
+    next_attempt = timezone.now() + datetime.timedelta(seconds=submit_settings.JUDGE_IN_FLIGHT_TIMEOUT)
+    claimed = reviews.update(short_response=ReviewResponse.SENT_TO_JUDGE,
+                             judge_attempts=F('judge_attempts') + 1,
+                             next_judge_attempt=next_attempt,
+                             sent_to_judge_time=None)
+    if not claimed:
+        return False
+
+    review.short_response = ReviewResponse.SENT_TO_JUDGE
+    review.judge_attempts += 1
+    review.next_judge_attempt = next_attempt
+    review.sent_to_judge_time = None
+    return True
+
+
+def _release_review(review, error):
+    """
+    Returns a claimed review to the queue if judge is busy, schedules its next attempt if judge is unavailable,
+    or marks it as failed if its file cannot be read.
+    """
+    review.next_judge_attempt = None
+    if isinstance(error, SubmitFileError):
+        review.short_response = ReviewResponse.SUBMIT_FILE_UNAVAILABLE
+        Review.objects.filter(pk=review.pk).update(short_response=review.short_response, next_judge_attempt=None)
+        return
+
+    if isinstance(error, JudgeBusyError):
+        review.short_response = ReviewResponse.SENDING_TO_JUDGE
+        review.judge_attempts -= 1
+        Review.objects.filter(pk=review.pk).update(short_response=review.short_response,
+                                                   judge_attempts=F('judge_attempts') - 1,
+                                                   next_judge_attempt=None)
+        return
+
+    review.short_response = ReviewResponse.JUDGE_UNAVAILABLE
+    if review.judge_attempts < submit_settings.JUDGE_RETRY_MAX_ATTEMPTS:
+        review.next_judge_attempt = timezone.now() + _retry_delay(review.judge_attempts)
+    Review.objects.filter(pk=review.pk).update(short_response=review.short_response,
+                                               next_judge_attempt=review.next_judge_attempt)
+
+
+def _mark_review_sent(review, endpoint):
+    review.judge_endpoint = str(endpoint)
+    review.sent_to_judge_time = timezone.now()
+    review.next_judge_attempt = None
+    Review.objects.filter(pk=review.pk).update(judge_endpoint=review.judge_endpoint,
+                                               sent_to_judge_time=review.sent_to_judge_time,
+                                               next_judge_attempt=None)
 
 
-def _send_to_judge(review):
-    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+def _retry_delay(attempts):
+    """
+    Exponential backoff with jitter, so reviews that failed together are not retried together.
+    """
+    delay = min(submit_settings.JUDGE_RETRY_MAX_DELAY, submit_settings.JUDGE_RETRY_BASE_DELAY * 2 ** (attempts - 1))
+    return datetime.timedelta(seconds=random.uniform(delay / 2.0, delay))
+
+
+def dispatch_queued_reviews(limit, concurrency=1):
+    """
+    Sends up to `limit` reviews queued for judge. Returns the number of processed reviews.
+    With `concurrency` greater than one, reviews are sent concurrently by the asyncio client (Python 3.5+).
+
+    Higher priority lanes are drained first, oldest reviews first within a lane.
+    To prevent starvation of lower lanes, up to half of the batch is reserved for reviews
+    waiting longer than `JUDGE_DISPATCH_STARVATION_TIMEOUT` seconds, regardless of their lane.
+    """
+    queued = Review.objects \
+        .filter(short_response=ReviewResponse.SENDING_TO_JUDGE) \
+        .select_related('submit__receiver', 'submit__user')
+
+    waiting_since = timezone.now() - datetime.timedelta(seconds=submit_settings.JUDGE_DISPATCH_STARVATION_TIMEOUT)
+    starving = list(queued
+                    .filter(time__lte=waiting_since, judge_priority__gt=JudgePriority.HIGH)
+                    .order_by('time', 'pk')[:max(1, limit // 2)])
+    reviews = starving + list(queued
+                              .exclude(pk__in=[review.pk for review in starving])
+                              .order_by('judge_priority', 'time', 'pk')[:limit - len(starving)])
+
+    if concurrency > 1:
+        from submit.judge_async import send_reviews_to_judge
+        return send_reviews_to_judge(reviews, concurrency)
+
+    processed = 0
+    for review in reviews:
+        try:
+            send_review_to_judge(review)
+        except (JudgeConnectionError, SubmitFileError):
+            pass
+        except JudgeBusyError:
+            break
+        processed += 1
+    return processed
+
+
+def requeue_stale_claims():
+    """
+    Reviews claimed for sending but never marked as sent within `JUDGE_IN_FLIGHT_TIMEOUT` seconds (the sending
+    process died) are marked `JUDGE_UNAVAILABLE`, due for another attempt unless they are out of attempts.
+    Returns the number of requeued reviews.
+    """
+    stale = Review.objects.filter(short_response=ReviewResponse.SENT_TO_JUDGE, sent_to_judge_time__isnull=True,
+                                  next_judge_attempt__lte=timezone.now())
+    requeued = stale.filter(judge_attempts__lt=submit_settings.JUDGE_RETRY_MAX_ATTEMPTS) \
+        .update(short_response=ReviewResponse.JUDGE_UNAVAILABLE)
+    return requeued + stale.update(short_response=ReviewResponse.JUDGE_UNAVAILABLE, next_judge_attempt=None)
+
+
+def retry_unavailable_reviews():
+    """
+    Retries sending reviews that failed with `JUDGE_UNAVAILABLE` and are due for another attempt,
+    including stale claims (see `requeue_stale_claims`).
+    At most `JUDGE_RETRY_MAX_CONCURRENT` reviews are retried at once and the batch stops at the first failure,
+    so a recovering judge is not flooded. Returns the number of successfully sent reviews.
+    """
+    requeue_stale_claims()
+    reviews = Review.objects \
+        .filter(short_response=ReviewResponse.JUDGE_UNAVAILABLE, next_judge_attempt__lte=timezone.now()) \
+        .select_related('submit__receiver', 'submit__user') \
+        .order_by('next_judge_attempt', 'pk')[:submit_settings.JUDGE_RETRY_MAX_CONCURRENT]
+
+    sent = 0
+    for review in reviews:
+        try:
+            if send_review_to_judge(review, retry=True):
+                sent += 1
+        except SubmitFileError:
+            continue
+        except (JudgeConnectionError, JudgeBusyError):
+            break
+    return sent
+
+
+def reviews_in_flight():
+    """
+    Returns the number of reviews being tested at each judge endpoint: reviews sent to judge without a protocol yet.
+    Reviews sent more than `JUDGE_IN_FLIGHT_TIMEOUT` seconds ago are considered lost and are not counted.
+    """
+    sent_after = timezone.now() - datetime.timedelta(seconds=submit_settings.JUDGE_IN_FLIGHT_TIMEOUT)
+    counts = Review.objects \
+        .filter(short_response__in=[ReviewResponse.SENT_TO_JUDGE, ReviewResponse.TESTING],
+                sent_to_judge_time__gt=sent_after) \
+        .order_by() \
+        .values_list('judge_endpoint') \
+        .annotate(count=Count('pk'))
+    return dict(counts)
+
+
+def _send_to_judge(review, raw_head):
+    """
+    Sends the header and the submitted file to the first judge endpoint that accepts it and returns the endpoint.
+    Raises JudgeConnectionError when no endpoint is available, JudgeBusyError when all of them are full
+    and SubmitFileError when the submitted file cannot be opened.
+    """
+    zero_copy = direct_local_path(review.submit.file_path()) is not None
+    pool = get_judge_pool()
+    in_flight = reviews_in_flight() if pool.max_in_flight is not None else {}
+    candidates = pool.candidates(in_flight)
+    if not candidates:
+        raise JudgeBusyError
+    # The file is opened outside of `pool.sending`, its errors must not take endpoints out of rotation
+    submitted_file = _open_submitted_file(review)
     try:
-        sock.connect((submit_settings.JUDGE_ADDRESS, submit_settings.JUDGE_PORT))
-        with open(review.raw_path(), 'rb') as raw:
-            sock.send(raw.read())
-    except:
-        raise JudgeConnectionError
+        for i, endpoint in enumerate(candidates):
+            if i > 0:
+                submitted_file.close()
+                submitted_file = _open_submitted_file(review)
+            try:
+                with pool.sending(endpoint):
+                    sock = endpoint.connect(pool.timeout)
+                    try:
+                        sock.sendall(raw_head)
+                        _send_file(sock, submitted_file, zero_copy=zero_copy)
+                    finally:
+                        sock.close()
+                return endpoint
+            except socket.error:
+                continue
     finally:
-        sock.close()
+        submitted_file.close()
+    raise JudgeConnectionError
+
 
+def _open_submitted_file(review):
+    try:
+        return open_file(review.submit.file_path())
+    except (IOError, OSError) as error:
+        raise SubmitFileError(error)
+
+
+def _send_file(sock, fileobj, zero_copy=True):
+    """
+    Sends the whole file, using zero-copy `socket.sendfile` where available (Python 3.5+)
+    unless the file is decompressed on the fly.
+    """
+    if zero_copy and hasattr(sock, 'sendfile'):
+        sock.sendfile(fileobj)
+        return
+    for chunk in iter(lambda: fileobj.read(FILE_CHUNK_SIZE), b''):
+        sock.sendall(chunk)
 
-def _prepare_raw_file(review):
-    with open(review.submit.file_path(), 'rb') as submitted_file:
-        submitted_source = submitted_file.read()
 
+def _prepare_raw_head(review):
+    """
+    Returns the header of data sent to judge, the submitted file follows it.
+    """
     review_id = str(review.id)
     user_id = '%s-%s' % (submit_settings.JUDGE_INTERFACE_IDENTITY, str(review.submit.user.id))
 
@@ -67,19 +381,156 @@ def _prepare_raw_file(review):
         timestamp,
         original_filename,
     )
+    return raw_head.encode('UTF-8')
+
 
-    write_chunks_to_file(review.raw_path(), [raw_head.encode('UTF-8'), submitted_source])
+def _write_raw_file(review, raw_head):
+    """
+    Stores a copy of data sent to judge as review.raw_path(), useful for debugging.
+    Raises SubmitFileError when the submitted file cannot be read or the copy cannot be written.
+    """
+    with _open_submitted_file(review) as submitted_file:
+        chunks = iter(lambda: submitted_file.read(FILE_CHUNK_SIZE), b'')
+        try:
+            write_chunks_to_file(review.raw_path(), itertools.chain([raw_head], chunks))
+        except (IOError, OSError) as error:
+            raise SubmitFileError(error)
 
 
 def parse_protocol(protocol_path, force_show_details=False):
     """
     Reads a testing protocol and prepares context for a web page rendering the protocol.
+    Parsed protocols are cached (in `SUBMIT_PROTOCOL_CACHE`) by path, modification time and size of the file,
+    `force_show_details` is applied to the cached data.
     """
+    key = _protocol_cache_key(protocol_path)
+    if key is None:
+        return {'ready': False}
+
+    cache = caches[submit_settings.SUBMIT_PROTOCOL_CACHE]
+    data = cache.get(key)
+    if data is None:
+        data = _parse_protocol_file(protocol_path)
+        if data['ready']:
+            cache.set(key, data, submit_settings.SUBMIT_PROTOCOL_CACHE_TIMEOUT)
+    return _show_details(data, force_show_details)
+
+
+def save_protocol(protocol_path, protocol):
+    """
+    Parses the protocol (bytes) in memory and atomically stores it to protocol_path, returns the parsed protocol.
+    It is also cached, so `parse_protocol` does not read the file again.
+    """
+    data = _parse_protocol(io.BytesIO(protocol))
+    write_chunks_to_file(protocol_path, [protocol])
+    if data['ready']:
+        key = _protocol_cache_key(protocol_path)
+        if key is not None:
+            caches[submit_settings.SUBMIT_PROTOCOL_CACHE].set(key, data, submit_settings.SUBMIT_PROTOCOL_CACHE_TIMEOUT)
+    return data
+
+
+def save_partial_protocol(review, tests, tests_total=None):
+    """
+    Appends results of tests (bytes with <test> elements) sent by judge during testing
+    and updates the testing progress of the review. Returns the parsed partial protocol,
+    or None if the review is not being tested anymore (partial results arriving after the whole protocol are ignored).
+    """
+    testing = Review.objects.filter(
+        pk=review.pk, short_response__in=[ReviewResponse.SENT_TO_JUDGE, ReviewResponse.TESTING],
+    )
+    if not testing.exists():
+        return None
+    append_to_file(review.partial_protocol_path(), tests)
+    data = parse_partial_protocol(review.partial_protocol_path())
+
+    progress = {'short_response': ReviewResponse.TESTING, 'tests_done': len(data['tests'])}
+    if tests_total is not None:
+        progress['tests_total'] = tests_total
+    if not testing.update(**progress):
+        # The whole protocol was received meanwhile, its partial protocol could have been removed already
+        remove_file(review.partial_protocol_path())
+        return None
+    return data
+
+
+def parse_partial_protocol(partial_protocol_path, force_show_details=False):
+    """
+    Parses results of tests received so far. Tests parsed earlier are kept in cache together with the size
+    of the file at that time, so only the newly appended tests are parsed.
+    """
+    size = file_size(partial_protocol_path)
+    if size is None:
+        return {'ready': False}
+
+    cache = caches[submit_settings.SUBMIT_PROTOCOL_CACHE]
+    key = 'submit-partial-protocol-' + hashlib.md5(partial_protocol_path.encode('utf-8')).hexdigest()
+    parsed = cache.get(key)
+    if parsed is None or parsed['offset'] > size:
+        parsed = {'offset': 0, 'tests': []}
+
+    if parsed['offset'] < size:
+        with open_file(partial_protocol_path) as partial_protocol:
+            partial_protocol.seek(parsed['offset'])
+            appended = partial_protocol.read(size - parsed['offset'])
+        data = _parse_protocol(io.BytesIO(b'<protokol><runLog>' + appended + b'</runLog></protokol>'))
+        # Otherwise the last append is still being written, it will be parsed next time
+        if data['ready']:
+            parsed = {'offset': size, 'tests': parsed['tests'] + data['tests']}
+            cache.set(key, parsed, submit_settings.SUBMIT_PROTOCOL_CACHE_TIMEOUT)
+
+    data = {
+        'ready': True,
+        'partial': True,
+        'compile_log_present': False,
+        'tests': parsed['tests'],
+        'have_tests': len(parsed['tests']) > 0,
+    }
+    return _show_details(data, force_show_details)
+
+
+def _protocol_cache_key(protocol_path):
+    version = file_version(protocol_path)
+    if version is None:
+        return None
+    return 'submit-protocol-' + hashlib.md5(version.encode('utf-8')).hexdigest()
+
+
+def _show_details(data, force_show_details):
+    """
+    Details are shown for sample tests, or for all tests when forced.
+    """
+    if 'tests' not in data:
+        return data
+    data = dict(data)
+    data['tests'] = [
+        dict(test, show_details=test['details'] is not None and ('sample' in test['name'] or force_show_details))
+        for test in data['tests']
+    ]
+    return data
+
+
+def _parse_protocol_file(protocol_path):
+    try:
+        protocol = open_file(protocol_path)
+    except IOError:
+        return {'ready': False}
+    with protocol:
+        return _parse_protocol(protocol)
+
+
+def _parse_protocol(protocol):
+    if submit_settings.SUBMIT_PROTOCOL_STREAMING_PARSER:
+        return _iterparse_protocol_file(protocol, submit_settings.SUBMIT_PROTOCOL_DETAILS_MAX_LENGTH)
+    return _tree_parse_protocol_file(protocol, submit_settings.SUBMIT_PROTOCOL_DETAILS_MAX_LENGTH)
+
+
+def _tree_parse_protocol_file(protocol, max_details_length=None):
     data = dict()
     data['ready'] = True
 
     try:
-        tree = ET.parse(protocol_path)
+        tree = ET.parse(protocol)
     except:
         # Protocol is either corrupted or just upload is not finished
         data['ready'] = False
@@ -93,17 +544,9 @@ def parse_protocol(protocol_path, force_show_details=False):
     runlog = tree.find('runLog')
     if runlog is not None:
         for runtest in runlog:
-            # Test log format in protocol is: name, resultCode, resultMsg, time, details
             if runtest.tag != 'test':
                 continue
-            test = dict()
-            test['name'] = runtest[0].text
-            test['result'] = runtest[2].text
-            test['time'] = runtest[3].text
-            details = runtest[4].text if len(runtest) > 4 else None
-            test['details'] = details
-            test['show_details'] = details is not None and ('sample' in test['name'] or force_show_details)
-            tests.append(test)
+            tests.append(_parse_test(runtest, max_details_length))
     data['tests'] = tests
     data['have_tests'] = len(tests) > 0
 
@@ -112,14 +555,148 @@ def parse_protocol(protocol_path, force_show_details=False):
     except:
         data['score'] = 0
 
-    if data['compile_log_present']:
-        data['final_result'] = JudgeTestResult.COMPILATION_ERROR
-    else:
-        # Test result of review is set by first non-OK test result
-        data['final_result'] = JudgeTestResult.OK
-        for test in data['tests']:
-            if test['result'] != JudgeTestResult.OK:
-                data['final_result'] = test['result']
-                break
+    data['final_result'] = _final_result(data)
+    return data
 
+
+def _iterparse_protocol_file(protocol, max_details_length=None):
+    """
+    Produces the same data as `_tree_parse_protocol_file`, but processes the protocol as a stream of elements
+    and discards every test as soon as it is parsed, so memory usage does not grow with the size of protocol.
+    """
+    data = dict()
+    data['ready'] = True
+    clog = None
+    runlog = None
+    score = None
+    tests = []
+
+    path = []
+    try:
+        for event, element in ET.iterparse(protocol, events=('start', 'end')):
+            if event == 'start':
+                if len(path) == 1 and element.tag == 'runLog' and runlog is None:
+                    runlog = element
+                path.append(element)
+                continue
+            path.pop()
+            depth = len(path)
+
+            if depth == 1 and element.tag == 'compileLog' and clog is None:
+                clog = element
+            elif depth == 2 and path[1] is runlog:
+                if element.tag == 'test':
+                    tests.append(_parse_test(element, max_details_length))
+                elif element.tag == 'score' and score is None:
+                    score = element.text
+            if depth in (1, 2):
+                path[-1].remove(element)
+    except (ET.ParseError, IOError):
+        # Protocol is either corrupted or just upload is not finished
+        data['ready'] = False
+        return data
+
+    data['compile_log_present'] = clog is not None
+    data['compile_log'] = clog.text if clog is not None else ''
+    data['tests'] = tests
+    data['have_tests'] = len(tests) > 0
+
+    try:
+        data['score'] = Decimal(score)
+    except:
+        data['score'] = 0
+
+    data['final_result'] = _final_result(data)
     return data
+
+
+def save_protocols(protocols):
+    """
+    Stores protocols of many reviews at once, `protocols` is a list of (review id, protocol bytes).
+    Reviews are loaded with one query and updated in one transaction, grouped by their new score and response.
+    Returns a dict review id -> 'ok', 'corrupted' (protocol is stored, review is marked as corrupted)
+    or 'not_found'.
+    """
+    reviews = Review.objects.select_related('submit__user', 'submit__receiver').in_bulk(
+        [review_id for review_id, protocol in protocols])
+
+    statuses = dict()
+    parsed = dict()
+    for review_id, protocol in protocols:
+        review = reviews.get(review_id)
+        if review is None:
+            statuses[review_id] = 'not_found'
+            continue
+        parsed[review_id] = save_protocol(review.protocol_path(), protocol)
+        remove_file(review.partial_protocol_path())
+        statuses[review_id] = 'ok' if parsed[review_id]['ready'] else 'corrupted'
+
+    updates = dict()
+    for review_id, protocol_data in parsed.items():
+        if protocol_data['ready']:
+            update = (('score', protocol_data['score']), ('short_response', protocol_data['final_result']))
+        else:
+            update = (('short_response', ReviewResponse.PROTOCOL_CORRUPTED),)
+        updates.setdefault(update, []).append(review_id)
+
+    with transaction.atomic():
+        for update, review_ids in updates.items():
+            Review.objects.filter(pk__in=review_ids).update(**dict(update))
+        # Queryset updates bypass Review.save
+        for user_id, receiver_id in set((reviews[review_id].submit.user_id, reviews[review_id].submit.receiver_id)
+                                        for review_id in parsed):
+            UserReceiverScore.objects.update_score(user_id, receiver_id)
+        ReviewTestResult.objects.filter(review__in=list(parsed)).delete()
+        ReviewTestResult.objects.bulk_create([
+            test_result
+            for review_id, protocol_data in parsed.items() if protocol_data['ready']
+            for test_result in test_results_from_protocol(
+                review_id, reviews[review_id].submit.receiver_id, protocol_data)
+        ])
+    return statuses
+
+
+def save_test_results(review, protocol_data):
+    """
+    Replaces stored test results of the review by the tests from its parsed protocol.
+    """
+    ReviewTestResult.objects.filter(review=review).delete()
+    if protocol_data['ready']:
+        ReviewTestResult.objects.bulk_create(
+            test_results_from_protocol(review.id, review.submit.receiver_id, protocol_data))
+
+
+def test_results_from_protocol(review_id, receiver_id, protocol_data):
+    return [
+        ReviewTestResult(
+            review_id=review_id,
+            receiver_id=receiver_id,
+            name=(test['name'] or '')[:128],
+            result=(test['result'] or '')[:16],
+            time=int(test['time']) if test['time'] and test['time'].isdigit() else None,
+        )
+        for test in protocol_data['tests']
+    ]
+
+
+def _parse_test(runtest, max_details_length=None):
+    # Test log format in protocol is: name, resultCode, resultMsg, time, details
+    test = dict()
+    test['name'] = runtest[0].text
+    test['result'] = runtest[2].text
+    test['time'] = runtest[3].text
+    details = runtest[4].text if len(runtest) > 4 else None
+    if details is not None and max_details_length is not None and len(details) > max_details_length:
+        details = details[:max_details_length] + '...'
+    test['details'] = details
+    return test
+
+
+def _final_result(data):
+    if data['compile_log_present']:
+        return JudgeTestResult.COMPILATION_ERROR
+    # Test result of review is set by first non-OK test result
+    for test in data['tests']:
+        if test['result'] != JudgeTestResult.OK:
+            return test['result']
+    return JudgeTestResult.OK
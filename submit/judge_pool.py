@@ -0,0 +1,127 @@
+import socket
+import threading
+import time
+from contextlib import contextmanager
+
+from submit import settings as submit_settings
+
+
+class JudgeEndpoint(object):
+    """
+    One judge server. Keeps the number of sends in progress and the health state of the server.
+    """
+    def __init__(self, address, port):
+        self.address = address
+        self.port = port
+        self.outstanding = 0
+        self.next_probe = None
+
+    @property
+    def in_rotation(self):
+        return self.next_probe is None
+
+    def connect(self, timeout):
+        return socket.create_connection((self.address, self.port), timeout)
+
+    def __str__(self):
+        return '%s:%d' % (self.address, self.port)
+
+
+class JudgePool(object):
+    """
+    Distributes submits among judge endpoints.
+
+    Endpoints are ordered by the number of reviews in testing and sends in progress,
+    ties are broken in a round-robin fashion. Endpoints with `max_in_flight` reviews in testing are skipped.
+    An endpoint that fails to connect is taken out of rotation. Every `probe_interval` seconds it is probed
+    by opening a connection; once the probe succeeds, the endpoint is put back.
+    When no endpoint is in rotation, the one due soonest for a probe is tried anyway and a successful send
+    puts it back, so a single judge is not skipped for the whole probe interval after one failure.
+    State of the pool is kept per process.
+    """
+    def __init__(self, endpoints, timeout, probe_interval, max_in_flight=None):
+        self.endpoints = [JudgeEndpoint(address, port) for address, port in endpoints]
+        self.timeout = timeout
+        self.probe_interval = probe_interval
+        self.max_in_flight = max_in_flight
+        self._lock = threading.Lock()
+        self._turn = 0
+
+    @classmethod
+    def from_settings(cls):
+        return cls(submit_settings.JUDGE_ENDPOINTS,
+                   timeout=submit_settings.JUDGE_CONNECTION_TIMEOUT,
+                   probe_interval=submit_settings.JUDGE_ENDPOINT_PROBE_INTERVAL,
+                   max_in_flight=submit_settings.JUDGE_MAX_IN_FLIGHT)
+
+    def candidates(self, in_flight=None):
+        """
+        Returns endpoints in rotation that can accept a review, in the order in which they should be tried.
+        When no endpoint is in rotation, the one due for a probe first is tried. An empty list means that
+        all endpoints to try have `max_in_flight` reviews in testing.
+        `in_flight` maps endpoint names to the number of reviews in testing.
+        """
+        in_flight = in_flight or {}
+        self.probe_endpoints()
+        with self._lock:
+            self._turn = (self._turn + 1) % len(self.endpoints)
+            rotated = self.endpoints[self._turn:] + self.endpoints[:self._turn]
+
+        in_rotation = self.in_rotation(rotated)
+        if not in_rotation:
+            in_rotation = [min(self.endpoints, key=lambda endpoint: endpoint.next_probe)]
+
+        candidates = []
+        for endpoint in in_rotation:
+            load = in_flight.get(str(endpoint), 0)
+            if self.max_in_flight is None or load < self.max_in_flight:
+                candidates.append((load + endpoint.outstanding, endpoint))
+        return [endpoint for load, endpoint in sorted(candidates, key=lambda c: c[0])]
+
+    def in_rotation(self, endpoints=None):
+        return [e for e in (endpoints or self.endpoints) if e.in_rotation]
+
+    def probe_endpoints(self):
+        """
+        Tries to connect to endpoints out of rotation that are due for a health probe.
+        """
+        now = time.time()
+        for endpoint in self.endpoints:
+            if endpoint.in_rotation or endpoint.next_probe > now:
+                continue
+            try:
+                endpoint.connect(self.timeout).close()
+                endpoint.next_probe = None
+            except socket.error:
+                endpoint.next_probe = now + self.probe_interval
+
+    def take_out_of_rotation(self, endpoint):
+        endpoint.next_probe = time.time() + self.probe_interval
+
+    @contextmanager
+    def sending(self, endpoint):
+        """
+        Counts the send in progress to the endpoint, the endpoint is taken out of rotation if the send fails
+        and put back if it succeeds.
+        """
+        with self._lock:
+            endpoint.outstanding += 1
+        try:
+            yield endpoint
+            endpoint.next_probe = None
+        except socket.error:
+            self.take_out_of_rotation(endpoint)
+            raise
+        finally:
+            with self._lock:
+                endpoint.outstanding -= 1
+
+
+_judge_pool = None
+
+
+def get_judge_pool():
+    global _judge_pool
+    if _judge_pool is None:
+        _judge_pool = JudgePool.from_settings()
+    return _judge_pool
@@ -0,0 +1,77 @@
+from multiprocessing import Pool
+from threading import local
+
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+
+from submit.judge_helpers import _parse_protocol_file, test_results_from_protocol
+from submit.models import Review, ReviewTestResult
+
+
+# Connections inherited by a worker, kept referenced so they are never closed (or garbage collected) by the worker
+_inherited_connections = None
+
+
+def _drop_inherited_connections():
+    """
+    Initializer of workers: the connections inherited from the main process are forgotten without closing them
+    (that would close them also for the main process), a worker opens its own when it needs one.
+    """
+    global _inherited_connections
+    _inherited_connections = connections._connections
+    connections._connections = local()
+
+
+def _parse(args):
+    review_id, receiver_id, protocol_path = args
+    protocol_data = _parse_protocol_file(protocol_path)
+    if not protocol_data['ready']:
+        return review_id, receiver_id, None
+    return review_id, receiver_id, protocol_data
+
+
+class Command(BaseCommand):
+    help = 'Stores test results of reviews that have a protocol, but no stored test results. ' \
+           'Protocols are parsed in parallel, results are saved by the main process.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=None,
+                            help='Number of worker processes (defaults to the number of CPUs).')
+        parser.add_argument('--receiver', type=int, action='append', default=[],
+                            help='Backfill only reviews of this receiver, can be repeated.')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Number of reviews whose test results are saved in one transaction.')
+
+    def _reviews(self, receivers):
+        reviews = Review.objects.filter(test_results__isnull=True).select_related('submit__user', 'submit__receiver')
+        if receivers:
+            reviews = reviews.filter(submit__receiver__in=receivers)
+        for review in reviews.order_by('pk').iterator():
+            yield review.id, review.submit.receiver_id, review.protocol_path()
+
+    def _save(self, batch):
+        with transaction.atomic():
+            ReviewTestResult.objects.filter(review__in=[review_id for review_id, _ in batch]).delete()
+            ReviewTestResult.objects.bulk_create([result for _, results in batch for result in results])
+
+    def handle(self, *args, **options):
+        # Reviews are listed before parsing starts. Workers query the database only for protocols packed into
+        # archives, using their own connections.
+        reviews = list(self._reviews(options['receiver']))
+        pool = Pool(options['processes'], initializer=_drop_inherited_connections)
+        saved, batch = 0, []
+        try:
+            for review_id, receiver_id, protocol_data in pool.imap_unordered(_parse, reviews, chunksize=16):
+                if protocol_data is None:
+                    continue
+                batch.append((review_id, test_results_from_protocol(review_id, receiver_id, protocol_data)))
+                if len(batch) >= options['batch_size']:
+                    self._save(batch)
+                    saved, batch = saved + len(batch), []
+            if batch:
+                self._save(batch)
+                saved += len(batch)
+        finally:
+            pool.close()
+            pool.join()
+        self.stdout.write('Stored test results of %d reviews.' % saved)
@@ -0,0 +1,39 @@
+import os
+from multiprocessing import Pool
+
+from django.core.management.base import BaseCommand, CommandError
+
+from submit import settings as submit_settings
+from submit.storage import compress_file, local_path
+
+
+def _compress(args):
+    return compress_file(*args)
+
+
+class Command(BaseCommand):
+    help = 'Compresses already stored submit, review, protocol and raw files. ' \
+           'Files that are already compressed are skipped, so the command can be run repeatedly.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=('gzip', 'zstd'), default='gzip',
+                            help='Compression format, zstd requires package zstandard.')
+        parser.add_argument('--processes', type=int, default=None,
+                            help='Number of worker processes (defaults to the number of CPUs).')
+
+    def _files(self, compression):
+        for dirpath, dirnames, filenames in os.walk(submit_settings.SUBMIT_PATH):
+            for filename in filenames:
+                if os.path.splitext(filename)[1] in submit_settings.SUBMIT_COMPRESSED_FILE_TYPES:
+                    yield os.path.join(dirpath, filename), compression
+
+    def handle(self, *args, **options):
+        if local_path(submit_settings.SUBMIT_PATH) is None:
+            raise CommandError('Files can be compressed only in the local file system storage.')
+        pool = Pool(options['processes'])
+        try:
+            compressed = sum(pool.imap_unordered(_compress, self._files(options['format']), chunksize=64))
+        finally:
+            pool.close()
+            pool.join()
+        self.stdout.write('Compressed %d files.' % compressed)
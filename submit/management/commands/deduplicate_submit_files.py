@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from submit.constants import FILE_CHUNK_SIZE
+from submit.models import Submit
+from submit.storage import file_exists, open_file, remove_file, write_blob
+
+
+class Command(BaseCommand):
+    help = 'Moves submitted files of existing submits to the blob store, so equal files are stored only once. ' \
+           'Submits already using the blob store are skipped.'
+
+    def handle(self, *args, **options):
+        moved = 0
+        submits = Submit.objects.filter(file_hash='').select_related('user', 'receiver').order_by('pk')
+        for submit in submits.iterator():
+            file_path = submit.file_path()
+            if not file_exists(file_path):
+                continue
+            with open_file(file_path) as submitted_file:
+                file_hash = write_blob(iter(lambda: submitted_file.read(FILE_CHUNK_SIZE), b''))
+            # The old file is removed only after the submit points to the blob
+            Submit.objects.filter(pk=submit.pk).update(file_hash=file_hash)
+            remove_file(file_path)
+            moved += 1
+        self.stdout.write('Moved %d submitted files to the blob store.' % moved)
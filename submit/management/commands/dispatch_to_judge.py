@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from submit.judge_helpers import dispatch_queued_reviews, retry_unavailable_reviews
+
+
+class Command(BaseCommand):
+    help = 'Sends reviews queued for judge (in state "Sending to judge") to judge ' \
+           'and retries reviews that failed with "Judge unavailable".'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Send all currently queued reviews and exit.')
+        parser.add_argument('--batch-size', type=int, default=100,
+                            help='Number of reviews loaded from database at once.')
+        parser.add_argument('--sleep', type=float, default=1.0,
+                            help='Seconds to wait before polling an empty queue again.')
+        parser.add_argument('--concurrency', type=int, default=1,
+                            help='Number of reviews sent at once by the asyncio judge client (Python 3.5+).')
+
+    def handle(self, *args, **options):
+        while True:
+            processed = dispatch_queued_reviews(options['batch_size'], options['concurrency'])
+            retried = retry_unavailable_reviews()
+            if processed or retried:
+                self.stdout.write('Dispatched %d reviews, retried %d reviews.' % (processed, retried))
+                continue
+            if options['once']:
+                break
+            time.sleep(options['sleep'])
@@ -0,0 +1,64 @@
+import os
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+
+from submit import settings as submit_settings
+from submit.constants import ReviewResponse
+from submit.models import RejudgeJob, Review, Submit, SubmitReceiver
+from submit.storage import pack_files
+
+
+class Command(BaseCommand):
+    help = 'Packs all files of submits of finished receivers (submitted files, reviews, protocols, raw files) ' \
+           'into one archive per receiver in /settings.SUBMIT_PATH/archives/, files are then read from the archive. ' \
+           'Loose files are removed after they are verified in the archive. Files added later (e.g. by rejudge) ' \
+           'stay loose until the command is run again.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('receivers', type=int, nargs='+', help='Ids of receivers to pack.')
+        parser.add_argument('--force', action='store_true', default=False,
+                            help='Pack also receivers with reviews waiting for judge or running rejudge jobs.')
+
+    def _unfinished(self, receiver):
+        return Review.objects.filter(
+            submit__receiver=receiver,
+            short_response__in=ReviewResponse.PENDING,
+        ).exists() or RejudgeJob.objects.filter(
+            receiver=receiver, status__in=[RejudgeJob.PENDING, RejudgeJob.RUNNING, RejudgeJob.PAUSED],
+        ).exists()
+
+    def _file_paths(self, receiver):
+        review_ids = {}
+        for review_id, submit_id in Review.objects.filter(submit__receiver=receiver).order_by('pk') \
+                .values_list('pk', 'submit_id'):
+            review_ids.setdefault(submit_id, []).append(review_id)
+
+        # Deduplicated submits share one blob
+        blob_paths = set()
+        submits = Submit.objects.filter(receiver=receiver).select_related('user', 'receiver').order_by('pk')
+        for submit in submits.iterator():
+            if submit.file_path() not in blob_paths:
+                if submit.file_hash:
+                    blob_paths.add(submit.file_path())
+                yield submit.file_path()
+            for review_id in review_ids.get(submit.pk, []):
+                review = Review(pk=review_id, submit=submit)
+                yield review.file_path()
+                yield review.raw_path()
+                yield review.protocol_path()
+
+    def handle(self, *args, **options):
+        receivers = SubmitReceiver.objects.filter(pk__in=options['receivers']).order_by('pk')
+        missing = set(options['receivers']) - set(receiver.pk for receiver in receivers)
+        if missing:
+            raise CommandError('Receivers %s do not exist.' % ', '.join(str(pk) for pk in sorted(missing)))
+
+        for receiver in receivers:
+            if not options['force'] and self._unfinished(receiver):
+                self.stdout.write('Skipped receiver %d, it has reviews waiting for judge or rejudge jobs.' % receiver.pk)
+                continue
+            archive_path = os.path.join(submit_settings.SUBMIT_PATH, 'archives', str(receiver.pk),
+                                        '%s.pack' % uuid.uuid4().hex)
+            packed = pack_files(archive_path, self._file_paths(receiver))
+            self.stdout.write('Packed %d files of receiver %d.' % (packed, receiver.pk))
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from submit.models import Submit, UserReceiverScore
+
+
+class Command(BaseCommand):
+    help = 'Recomputes UserReceiverScore of all users and receivers from their submits and reviews. ' \
+           'Run it after SUBMIT_USER_RECEIVER_SCORE_AGGREGATION is changed, or with --check to find scores ' \
+           'which are not consistent with reviews.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--receiver', type=int, action='append', default=[],
+                            help='Rebuild only scores for this receiver, can be repeated.')
+        parser.add_argument('--check', action='store_true', default=False,
+                            help='Only report the number of wrong scores, do not change them.')
+
+    def handle(self, *args, **options):
+        submits = Submit.objects.all()
+        scores = UserReceiverScore.objects.all()
+        if options['receiver']:
+            submits = submits.filter(receiver__in=options['receiver'])
+            scores = scores.filter(receiver__in=options['receiver'])
+
+        stored = {(user_id, receiver_id): (score, review_id)
+                  for user_id, receiver_id, score, review_id in scores.values_list('user', 'receiver', 'score', 'review')}
+        pairs = set(submits.order_by().values_list('user', 'receiver').distinct()) | set(stored)
+
+        wrong = 0
+        for user_id, receiver_id in sorted(pairs):
+            score = UserReceiverScore.objects.compute_score(user_id, receiver_id)
+            expected = (score[0], score[1].pk) if score is not None else None
+            if stored.get((user_id, receiver_id)) == expected:
+                continue
+            wrong += 1
+            if not options['check']:
+                UserReceiverScore.objects.update_score(user_id, receiver_id)
+
+        if options['check']:
+            self.stdout.write('%d of %d scores are wrong.' % (wrong, len(pairs)))
+        else:
+            self.stdout.write('Updated %d of %d scores.' % (wrong, len(pairs)))
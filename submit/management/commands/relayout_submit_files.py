@@ -0,0 +1,88 @@
+import os
+from multiprocessing import Pool
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from submit import settings as submit_settings
+from submit.models import PackedFile, Submit
+from submit.storage import local_path, remove_empty_directories, storage_name
+
+
+def _move(args):
+    """
+    Moves the directory of one submit, returns False if there was nothing to move.
+    When the target already exists (e.g. new files were stored there), only the missing files are moved.
+    """
+    source, target = args
+    if not os.path.isdir(source):
+        return False
+    if not os.path.exists(target):
+        try:
+            os.makedirs(os.path.dirname(target))
+        except os.error:
+            pass
+        os.rename(source, target)
+    else:
+        for filename in os.listdir(source):
+            if not os.path.exists(os.path.join(target, filename)):
+                os.rename(os.path.join(source, filename), os.path.join(target, filename))
+            else:
+                os.remove(os.path.join(source, filename))
+        os.rmdir(source)
+
+    remove_empty_directories(os.path.dirname(source))
+    return True
+
+
+class Command(BaseCommand):
+    help = 'Moves files of submits from the layout given by --from-function to the layout ' \
+           'in settings.SUBMIT_DIR_PATH_FUNCTION. Submits already moved are skipped, so the command can be run ' \
+           'repeatedly, run it right after the setting is changed.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from-function', default='submit.defaults.submit_dir_path',
+                            help='Path function of the current layout of files.')
+        parser.add_argument('--processes', type=int, default=None,
+                            help='Number of worker processes (defaults to the number of CPUs).')
+
+    def _moves(self, from_function):
+        from_function = import_string(from_function)
+        to_function = import_string(submit_settings.SUBMIT_DIR_PATH_FUNCTION)
+        for pk, user_id, receiver_id in Submit.objects.order_by('pk').values_list('pk', 'user_id', 'receiver_id'):
+            submit = Submit(pk=pk, user_id=user_id, receiver_id=receiver_id)
+            source = os.path.join(submit_settings.SUBMIT_PATH, from_function(submit))
+            target = os.path.join(submit_settings.SUBMIT_PATH, to_function(submit))
+            if source != target:
+                yield source, target
+
+    def _rename_packed_files(self, moves):
+        """
+        Files packed into archives are not moved, only their names in the index are changed.
+        """
+        targets = {storage_name(source): storage_name(target) for source, target in moves}
+        renamed = 0
+        with transaction.atomic():
+            for pk, name in list(PackedFile.objects.values_list('pk', 'name')):
+                directory, filename = name.rsplit('/', 1) if '/' in name else ('', name)
+                if directory in targets:
+                    PackedFile.objects.filter(pk=pk).update(name='%s/%s' % (targets[directory], filename))
+                    renamed += 1
+        return renamed
+
+    def handle(self, *args, **options):
+        if local_path(submit_settings.SUBMIT_PATH) is None:
+            raise CommandError('Files can be moved only in the local file system storage.')
+        # Paths are computed before moving starts, the workers do not touch the database
+        moves = list(self._moves(options['from_function']))
+        pool = Pool(options['processes'])
+        try:
+            moved = sum(pool.imap_unordered(_move, moves, chunksize=64))
+        finally:
+            pool.close()
+            pool.join()
+        self.stdout.write('Moved files of %d submits.' % moved)
+        renamed = self._rename_packed_files(moves)
+        if renamed:
+            self.stdout.write('Renamed %d files packed into archives.' % renamed)
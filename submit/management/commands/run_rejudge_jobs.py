@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from submit.rejudge_helpers import run_rejudge_jobs
+
+
+class Command(BaseCommand):
+    help = 'Runs pending rejudge jobs and resumes interrupted ones. Only one instance should run at a time.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Run all currently pending jobs and exit.')
+        parser.add_argument('--sleep', type=float, default=5.0,
+                            help='Seconds to wait before checking for new jobs again.')
+
+    def handle(self, *args, **options):
+        while True:
+            processed = run_rejudge_jobs()
+            if processed:
+                self.stdout.write('Processed %d rejudge jobs.' % processed)
+                continue
+            if options['once']:
+                break
+            time.sleep(options['sleep'])
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from submit.models import Review, Submit
+
+
+class Command(BaseCommand):
+    help = 'Recomputes Submit.last_review from reviews and fixes submits pointing elsewhere, e.g. after reviews ' \
+           'were changed by queryset updates which bypass Review.save.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--receiver', type=int, action='append', default=[],
+                            help='Check only submits of this receiver, can be repeated.')
+        parser.add_argument('--check', action='store_true', default=False,
+                            help='Only report the number of submits with a wrong last review.')
+
+    def handle(self, *args, **options):
+        submits = Submit.objects.all()
+        if options['receiver']:
+            submits = submits.filter(receiver__in=options['receiver'])
+
+        last_reviews = dict(
+            Review.objects.last_reviews(submits).prefetch_related(None).values_list('submit_id', 'pk')
+        )
+        wrong = [
+            (submit_id, last_reviews.get(submit_id))
+            for submit_id, last_review_id in submits.values_list('pk', 'last_review_id').iterator()
+            if last_reviews.get(submit_id) != last_review_id
+        ]
+        if options['check']:
+            self.stdout.write('%d submits have a wrong last review.' % len(wrong))
+            return
+
+        with transaction.atomic():
+            for submit_id, last_review_id in wrong:
+                Submit.objects.filter(pk=submit_id).update(last_review=last_review_id)
+        self.stdout.write('Updated last reviews of %d submits.' % len(wrong))
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('submit', '0008_auto_20170217_1208'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='review',
+            name='short_response',
+            field=models.CharField(blank=True, choices=[('Manual review', (('Reviewed', 'Reviewed'),)), ('Judge test results', [('OK', 'OK'), ('WA', 'Wrong answer'), ('TLE', 'Time limit exceeded'), ('EXC', 'Runtime exception'), ('SEC', 'Security exception'), ('IGN', 'Ignored'), ('CERR', 'Compilation error')]), ('Judge communication', [('Sending to judge', 'Sending to judge'), ('Sent to judge', 'Sent to judge'), ('Judge unavailable', 'Judge unavailable'), ('Protocol corrupted', 'Protocol corrupted')])], db_index=True, max_length=128),
+        ),
+    ]
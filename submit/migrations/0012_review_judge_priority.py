@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 19:32
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('submit', '0011_rejudgejob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='review',
+            name='judge_priority',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'high (submit)'), (1, 'medium (rejudge of one submit)'), (2, 'low (bulk rejudge)')], default=0, editable=False),
+        ),
+        migrations.AlterIndexTogether(
+            name='review',
+            index_together=set([('short_response', 'judge_priority', 'time')]),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 19:33
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('submit', '0012_review_judge_priority'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='review',
+            name='judge_endpoint',
+            field=models.CharField(blank=True, editable=False, max_length=128),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='sent_to_judge_time',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AlterIndexTogether(
+            name='review',
+            index_together=set([('short_response', 'sent_to_judge_time'), ('short_response', 'judge_priority', 'time')]),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 19:39
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('submit', '0013_review_judge_endpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReviewTestResult',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=128)),
+                ('result', models.CharField(max_length=16)),
+                ('time', models.PositiveIntegerField(blank=True, help_text='In milliseconds.', null=True)),
+            ],
+            options={
+                'verbose_name': 'review test result',
+                'verbose_name_plural': 'review test results',
+            },
+        ),
+        migrations.AddField(
+            model_name='reviewtestresult',
+            name='receiver',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='submit.SubmitReceiver'),
+        ),
+        migrations.AddField(
+            model_name='reviewtestresult',
+            name='review',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='test_results', to='submit.Review'),
+        ),
+        migrations.AlterIndexTogether(
+            name='reviewtestresult',
+            index_together=set([('receiver', 'name', 'time'), ('receiver', 'name', 'result')]),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 19:49
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('submit', '0014_reviewtestresult'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='review',
+            name='tests_done',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='review',
+            name='tests_total',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AlterField(
+            model_name='review',
+            name='short_response',
+            field=models.CharField(blank=True, choices=[('Manual review', (('Reviewed', 'Reviewed'),)), ('Judge test results', [('OK', 'OK'), ('WA', 'Wrong answer'), ('TLE', 'Time limit exceeded'), ('EXC', 'Runtime exception'), ('SEC', 'Security exception'), ('IGN', 'Ignored'), ('CERR', 'Compilation error')]), ('Judge communication', [('Sending to judge', 'Sending to judge'), ('Sent to judge', 'Sent to judge'), ('Testing', 'Testing'), ('Judge unavailable', 'Judge unavailable'), ('Protocol corrupted', 'Protocol corrupted')])], db_index=True, max_length=128),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 19:50
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('submit', '0015_review_tests_done'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submit',
+            name='file_hash',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='SHA-256 of the submitted file, if it is stored in the blob store shared by submits with equal files.', max_length=64),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 19:51
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('submit', '0016_submit_file_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='review',
+            name='judge_inputs_folder',
+            field=models.CharField(blank=True, editable=False, max_length=128),
+        ),
+        migrations.AddField(
+            model_name='submitreceiver',
+            name='skip_identical_resubmits',
+            field=models.BooleanField(default=False, help_text='Check to reuse the review of an earlier submit of the same user with an identical file instead of sending the file to judge again.'),
+        ),
+    ]
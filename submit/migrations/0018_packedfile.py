@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 19:59
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('submit', '0017_submitreceiver_skip_identical_resubmits'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PackedFile',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('archive', models.CharField(max_length=255)),
+                ('offset', models.BigIntegerField()),
+                ('size', models.BigIntegerField()),
+            ],
+            options={
+                'verbose_name': 'packed file',
+                'verbose_name_plural': 'packed files',
+            },
+        ),
+    ]
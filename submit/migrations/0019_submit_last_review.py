@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def set_last_reviews(apps, schema_editor):
+    # One UPDATE with a correlated subquery: the latest review by time, the one with the highest id on equal times
+    Review = apps.get_model('submit', 'Review')
+    Submit = apps.get_model('submit', 'Submit')
+    quote = schema_editor.quote_name
+    schema_editor.execute(
+        'UPDATE {submit} SET {last_review} = ('
+        'SELECT MAX(review.{review_id}) FROM {review} review WHERE review.{submit_id} = {submit}.{id} '
+        'AND review.{time} = (SELECT MAX(latest.{time}) FROM {review} latest WHERE latest.{submit_id} = {submit}.{id})'
+        ')'.format(
+            submit=quote(Submit._meta.db_table), id=quote(Submit._meta.pk.column),
+            last_review=quote(Submit._meta.get_field('last_review').column),
+            review=quote(Review._meta.db_table), review_id=quote(Review._meta.pk.column),
+            submit_id=quote(Review._meta.get_field('submit').column), time=quote(Review._meta.get_field('time').column),
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('submit', '0018_packedfile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submit',
+            name='last_review',
+            field=models.ForeignKey(blank=True, editable=False, help_text='The latest review, kept up to date by reviews.', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='submit.Review'),
+        ),
+        migrations.RunPython(set_last_reviews, migrations.RunPython.noop),
+    ]
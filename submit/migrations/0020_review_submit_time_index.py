@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 20:02
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('submit', '0019_submit_last_review'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='review',
+            index_together=set([('submit', 'time'), ('short_response', 'sent_to_judge_time'), ('short_response', 'judge_priority', 'time')]),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 20:20
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('submit', '0020_review_submit_time_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserReceiverScore',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.DecimalField(decimal_places=5, max_digits=10)),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'user receiver score',
+                'verbose_name_plural': 'user receiver scores',
+            },
+        ),
+        migrations.AddField(
+            model_name='userreceiverscore',
+            name='receiver',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_scores', to='submit.SubmitReceiver'),
+        ),
+        migrations.AddField(
+            model_name='userreceiverscore',
+            name='review',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='submit.Review'),
+        ),
+        migrations.AddField(
+            model_name='userreceiverscore',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterUniqueTogether(
+            name='userreceiverscore',
+            unique_together=set([('user', 'receiver')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='userreceiverscore',
+            index_together=set([('receiver', 'score')]),
+        ),
+    ]
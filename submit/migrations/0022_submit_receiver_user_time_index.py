@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.29 on 2026-10-18 20:31
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('submit', '0021_userreceiverscore'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='submit',
+            index_together=set([('receiver', 'user', 'time')]),
+        ),
+    ]
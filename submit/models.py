@@ -4,14 +4,15 @@ import os
 from django.conf import settings as django_settings
 from django.core.exceptions import ValidationError
 from django.core.urlresolvers import reverse
-from django.db import models
+from django.db import connections, models, transaction
 from django.db.models.query import Prefetch
+from django.db.models.signals import post_delete
 from django.utils.encoding import python_2_unicode_compatible
 from django.utils.module_loading import import_string
 from django.utils.translation import ugettext_lazy as _
 
 from submit import settings as submit_settings
-from submit import constants
+from submit import constants, storage
 
 
 class BaseTask(models.Model):
@@ -69,6 +70,10 @@ class SubmitReceiver(models.Model):
     inputs_folder_at_judge = models.CharField(max_length=128, blank=True, default='',  help_text=_(
         'If left blank, and send_to_judge is checked, this field will be set automatically.'))
 
+    skip_identical_resubmits = models.BooleanField(default=False, help_text=_(
+        'Check to reuse the review of an earlier submit of the same user with an identical file '
+        'instead of sending the file to judge again.'))
+
     show_all_details = models.BooleanField(default=False, help_text=_('Check to display protocol details to all users.'))
     show_submitted_file = models.BooleanField(default=False, help_text=_(
         'Check to render submitted file as a part of web page for submit.'))
@@ -108,14 +113,12 @@ class SubmitReceiver(models.Model):
 
 class SubmitWithReviewManager(models.Manager):
     def get_queryset(self):
+        """
+        The last review of each submit is fetched by its primary key from `Submit.last_review`,
+        using `Review.objects` so that data for score calculation are prefetched too.
+        """
         submit_qs = super(SubmitWithReviewManager, self).get_queryset()
-
-        reviews_qs = Review.objects \
-            .filter(submit__in=submit_qs) \
-            .order_by('-submit__time', '-submit__pk', '-time', '-pk') \
-            .distinct('submit__time', 'submit__pk') \
-
-        return submit_qs.prefetch_related(Prefetch('review_set', queryset=reviews_qs, to_attr='last_reviews_list'))
+        return submit_qs.prefetch_related(Prefetch('last_review', queryset=Review.objects.all()))
 
 
 @python_2_unicode_compatible
@@ -127,6 +130,8 @@ class Submit(models.Model):
     user = models.ForeignKey(django_settings.AUTH_USER_MODEL)
     time = models.DateTimeField(auto_now_add=True)
     filename = models.CharField(max_length=128, blank=True)
+    file_hash = models.CharField(max_length=64, blank=True, db_index=True, editable=False, help_text=_(
+        'SHA-256 of the submitted file, if it is stored in the blob store shared by submits with equal files.'))
 
     NOT_ACCEPTED = 0
     ACCEPTED_WITH_PENALIZATION = 1
@@ -137,34 +142,68 @@ class Submit(models.Model):
         (ACCEPTED, _('yes')),
     ]
     is_accepted = models.IntegerField(default=ACCEPTED, choices=IS_ACCEPTED_CHOICES)
+    last_review = models.ForeignKey('Review', null=True, blank=True, on_delete=models.SET_NULL, related_name='+',
+                                    editable=False, help_text=_('The latest review, kept up to date by reviews.'))
 
     objects = models.Manager()
     with_reviews = SubmitWithReviewManager()
 
+    def __init__(self, *args, **kwargs):
+        super(Submit, self).__init__(*args, **kwargs)
+        # Read from __dict__, accessing a deferred field would query the database
+        self._saved_is_accepted = self.__dict__.get('is_accepted')
+
+    def save(self, *args, **kwargs):
+        # `last_review` is written only by `update_last_review`, so a stale instance does not point it back
+        if not self._state.adding and not args and not kwargs.get('force_insert'):
+            update_fields = kwargs.get('update_fields')
+            if update_fields is None:
+                deferred = self.get_deferred_fields()
+                update_fields = [field.name for field in self._meta.concrete_fields
+                                 if not field.primary_key and field.attname not in deferred]
+            kwargs['update_fields'] = [name for name in update_fields if name not in ('last_review', 'last_review_id')]
+            if not kwargs['update_fields']:
+                return
+        with transaction.atomic():
+            update_score = not self._state.adding and self.__dict__.get('is_accepted') != self._saved_is_accepted
+            super(Submit, self).save(*args, **kwargs)
+            if update_score:
+                UserReceiverScore.objects.update_score(self.user_id, self.receiver_id)
+        self._saved_is_accepted = self.__dict__.get('is_accepted')
+
     def dir_path(self):
         """
         All files related to this submit are stored here: submitted file, review files, testing protocols, raw files.
-        Each submit has a dedicated location for its files in
-        /settings.SUBMIT_PATH/submits/<user_id>/<receiver_id>/<submit_id>/
+        Each submit has a dedicated location for its files in /settings.SUBMIT_PATH/,
+        given by `SUBMIT_DIR_PATH_FUNCTION`, by default submits/<user_id>/<receiver_id>/<submit_id>/
         """
-        return os.path.join(submit_settings.SUBMIT_PATH, 'submits',
-                            str(self.user.id), str(self.receiver.id), str(self.id))
+        return os.path.join(submit_settings.SUBMIT_PATH, import_string(submit_settings.SUBMIT_DIR_PATH_FUNCTION)(self))
 
     def file_path(self):
         """
         Submit can hold one file. The original filename is stored in submit.filename
         Because of the filename id.submit, files with inappropriate names (e.g. 12345.review) will be stored correctly.
+        Deduplicated files are shared by all submits with the same `file_hash`.
         """
+        if self.file_hash:
+            return storage.blob_path(self.file_hash)
         return os.path.join(self.dir_path(), str(self.id) + constants.SUBMITTED_FILE_EXTENSION)
 
     def file_exists(self):
-        return os.path.exists(self.file_path())
+        return storage.file_exists(self.file_path())
 
     def get_last_review(self):
-        if hasattr(self, 'last_reviews_list'):
-            return self.last_reviews_list[0] if len(self.last_reviews_list) > 0 else None
-        return self.review_set.order_by('-time', '-pk').first()
-    last_review = property(get_last_review)
+        return self.last_review
+
+    def update_last_review(self):
+        """
+        Points `last_review` to the latest review (by time), called whenever a review is created, re-timed or deleted.
+        The submit row is locked, so concurrent changes of reviews of one submit are applied one after another.
+        """
+        with transaction.atomic():
+            list(Submit.objects.select_for_update().filter(pk=self.pk).values_list('pk'))
+            self.last_review = Review.objects.filter(submit=self.pk).order_by('-time', '-pk').first()
+            Submit.objects.filter(pk=self.pk).update(last_review=self.last_review)
 
     def get_absolute_url(self):
         return reverse('submit.views.view_submit', kwargs=dict(submit_id=self.id))
@@ -172,6 +211,9 @@ class Submit(models.Model):
     class Meta:
         verbose_name = 'submit'
         verbose_name_plural = 'submits'
+        index_together = [
+            ('receiver', 'user', 'time'),
+        ]
 
     def __str__(self):
         return 'submit %d (%s, %s, %s)' % (
@@ -187,6 +229,25 @@ class ReviewManager(models.Manager):
         qs = super(ReviewManager, self).get_queryset()
         return import_string(submit_settings.SUBMIT_PREFETCH_DATA_FOR_SCORE_CALCULATION)(qs)
 
+    def last_reviews(self, submits):
+        """
+        The latest review (by time, then pk) of each of the submits, computed from all their reviews.
+        PostgreSQL selects them by DISTINCT ON, other databases by a correlated subquery, both use the index
+        on (submit, time).
+        """
+        reviews = self.get_queryset().filter(submit__in=submits)
+        connection = connections[reviews.db]
+        if connection.vendor == 'postgresql':
+            return reviews.order_by('submit', '-time', '-pk').distinct('submit')
+
+        qn = connection.ops.quote_name
+        return reviews.extra(where=[
+            '{review}.{id} = (SELECT latest.{id} FROM {review} latest WHERE latest.{submit} = {review}.{submit} '
+            'ORDER BY latest.{time} DESC, latest.{id} DESC LIMIT 1)'.format(
+                review=qn(self.model._meta.db_table), id=qn('id'), submit=qn('submit_id'), time=qn('time'),
+            )
+        ])
+
 
 @python_2_unicode_compatible
 class Review(models.Model):
@@ -202,13 +263,43 @@ class Review(models.Model):
     submit = models.ForeignKey(Submit)
     score = models.DecimalField(max_digits=10, decimal_places=5)
     time = models.DateTimeField(auto_now_add=True)
-    short_response = models.CharField(max_length=128, blank=True,
+    short_response = models.CharField(max_length=128, blank=True, db_index=True,
                                       choices=constants.ReviewResponse.all_items_as_choices())
     comment = models.TextField(blank=True)
     filename = models.CharField(max_length=128, blank=True)
 
+    judge_priority = models.PositiveSmallIntegerField(default=constants.JudgePriority.HIGH,
+                                                      choices=constants.JudgePriority.CHOICES, editable=False)
+    judge_attempts = models.PositiveIntegerField(default=0, editable=False)
+    next_judge_attempt = models.DateTimeField(null=True, blank=True, db_index=True, editable=False)
+    judge_endpoint = models.CharField(max_length=128, blank=True, editable=False)
+    judge_inputs_folder = models.CharField(max_length=128, blank=True, editable=False)
+    sent_to_judge_time = models.DateTimeField(null=True, blank=True, editable=False)
+    tests_done = models.PositiveIntegerField(default=0, editable=False)
+    tests_total = models.PositiveIntegerField(null=True, blank=True, editable=False)
+
     objects = ReviewManager()
 
+    def __init__(self, *args, **kwargs):
+        super(Review, self).__init__(*args, **kwargs)
+        # Read from __dict__, accessing a deferred field would query the database
+        self._saved_time = self.__dict__.get('time')
+        self._saved_short_response = self.__dict__.get('short_response')
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            update_last_review = self._state.adding or self.__dict__.get('time') != self._saved_time
+            # Reviews waiting for judge do not affect scores
+            update_score = self.short_response not in constants.ReviewResponse.PENDING or not (
+                self._state.adding or self._saved_short_response in constants.ReviewResponse.PENDING)
+            super(Review, self).save(*args, **kwargs)
+            if update_last_review:
+                self.submit.update_last_review()
+            if update_score:
+                UserReceiverScore.objects.update_score(self.submit.user_id, self.submit.receiver_id)
+        self._saved_time = self.__dict__.get('time')
+        self._saved_short_response = self.__dict__.get('short_response')
+
     def display_score(self):
         return import_string(submit_settings.SUBMIT_DISPLAY_SCORE)(self)
 
@@ -216,13 +307,17 @@ class Review(models.Model):
         return import_string(submit_settings.SUBMIT_RENDER_REVIEW_COMMENT)(self)
 
     def verbose_response(self):
+        if self.short_response == constants.ReviewResponse.TESTING:
+            if self.tests_total:
+                return _('Testing: %(done)d/%(total)d') % {'done': self.tests_done, 'total': self.tests_total}
+            return _('Testing: %(done)d') % {'done': self.tests_done}
         return constants.ReviewResponse.verbose(self.short_response)
 
     def file_path(self):
         return os.path.join(self.submit.dir_path(), str(self.id) + constants.REVIEWED_FILE_EXTENSION)
 
     def file_exists(self):
-        return os.path.exists(self.file_path())
+        return storage.file_exists(self.file_path())
 
     def raw_path(self):
         return os.path.join(self.submit.dir_path(), str(self.id) + constants.TESTING_RAW_EXTENSION)
@@ -231,11 +326,234 @@ class Review(models.Model):
         return os.path.join(self.submit.dir_path(), str(self.id) + constants.TESTING_PROTOCOL_EXTENSION)
 
     def protocol_exists(self):
-        return os.path.exists(self.protocol_path())
+        return storage.file_exists(self.protocol_path())
+
+    def partial_protocol_path(self):
+        """
+        Results of tests sent by judge during testing, before the whole protocol is ready.
+        """
+        return os.path.join(self.submit.dir_path(), str(self.id) + constants.TESTING_PARTIAL_PROTOCOL_EXTENSION)
 
     class Meta:
         verbose_name = 'review'
         verbose_name_plural = 'reviews'
+        index_together = [
+            ('short_response', 'judge_priority', 'time'),
+            ('short_response', 'sent_to_judge_time'),
+            ('submit', 'time'),
+        ]
 
     def __str__(self):
         return 'review %d for %s' % (self.id, str(self.submit))
+
+
+@python_2_unicode_compatible
+class ReviewTestResult(models.Model):
+    """
+    Result of one test from the testing protocol of a review, stored for statistics over many protocols.
+    `receiver` duplicates `review.submit.receiver`, so statistics of one receiver do not need joins.
+    """
+    review = models.ForeignKey(Review, related_name='test_results')
+    receiver = models.ForeignKey(SubmitReceiver, related_name='+')
+    name = models.CharField(max_length=128)
+    result = models.CharField(max_length=16)
+    time = models.PositiveIntegerField(null=True, blank=True, help_text=_('In milliseconds.'))
+
+    class Meta:
+        verbose_name = 'review test result'
+        verbose_name_plural = 'review test results'
+        index_together = [
+            ('receiver', 'name', 'result'),
+            ('receiver', 'name', 'time'),
+        ]
+
+    def __str__(self):
+        return '%s: %s' % (self.name, self.result)
+
+
+@python_2_unicode_compatible
+class RejudgeJob(models.Model):
+    """
+    Rejudge of submits of one receiver, executed in the background by `manage.py run_rejudge_jobs`.
+    Submits are processed in the order of their ids and `last_submit_id` is saved after each of them,
+    so the job can be paused and resumed (also after a crash).
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    PAUSED = 'paused'
+    FINISHED = 'finished'
+    STATUS_CHOICES = [
+        (PENDING, _('pending')),
+        (RUNNING, _('running')),
+        (PAUSED, _('paused')),
+        (FINISHED, _('finished')),
+    ]
+
+    receiver = models.ForeignKey(SubmitReceiver)
+    created_by = models.ForeignKey(django_settings.AUTH_USER_MODEL, null=True, blank=True,
+                                   on_delete=models.SET_NULL)
+    created = models.DateTimeField(auto_now_add=True)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=PENDING, db_index=True)
+
+    only_latest = models.BooleanField(default=False, help_text=_(
+        'Check to rejudge only the latest accepted submit of each user.'))
+    submits_per_second = models.FloatField(default=1.0, help_text=_(
+        'Submits are sent to judge at most this fast.'))
+
+    total = models.PositiveIntegerField(default=0)
+    done = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    last_submit_id = models.PositiveIntegerField(default=0)
+
+    def submits(self):
+        """
+        All submits rejudged by this job: accepted (also with penalization) submits received before the job was created.
+        """
+        submits = Submit.objects.filter(
+            receiver=self.receiver_id,
+            is_accepted__in=[Submit.ACCEPTED, Submit.ACCEPTED_WITH_PENALIZATION],
+        )
+        if self.created is not None:
+            submits = submits.filter(time__lte=self.created)
+        if self.only_latest:
+            latest = submits.values('user').annotate(latest_pk=models.Max('pk')).values('latest_pk')
+            submits = Submit.objects.filter(pk__in=latest)
+        return submits.order_by('pk')
+
+    def pending(self):
+        return self.total - self.done - self.failed
+
+    class Meta:
+        verbose_name = 'rejudge job'
+        verbose_name_plural = 'rejudge jobs'
+
+    def __str__(self):
+        return 'rejudge job %d (%s, %s)' % (self.id, self.receiver, self.status)
+
+
+@python_2_unicode_compatible
+class PackedFile(models.Model):
+    """
+    Index of a file packed by `manage.py pack_submit_files`: its data are `size` bytes at `offset` in `archive`.
+    `name` is the name of the stored (possibly compressed) file in the storage of submit files.
+    """
+    name = models.CharField(max_length=255, unique=True)
+    archive = models.CharField(max_length=255)
+    offset = models.BigIntegerField()
+    size = models.BigIntegerField()
+
+    class Meta:
+        verbose_name = 'packed file'
+        verbose_name_plural = 'packed files'
+
+    def __str__(self):
+        return '%s (%s)' % (self.name, self.archive)
+
+
+class UserReceiverScoreManager(models.Manager):
+    def compute_score(self, user_id, receiver_id):
+        """
+        Aggregates scores of the last finished reviews of submits of the user for the receiver
+        by `SUBMIT_USER_RECEIVER_SCORE_AGGREGATION`. Returns (score, review) or None if no submit counts.
+        """
+        aggregation = submit_settings.SUBMIT_USER_RECEIVER_SCORE_AGGREGATION
+        reviews = Review.objects \
+            .filter(submit__user=user_id, submit__receiver=receiver_id) \
+            .exclude(short_response__in=constants.ReviewResponse.PENDING) \
+            .select_related('submit') \
+            .order_by('submit__time', 'submit__pk', 'time', 'pk')
+
+        last_reviews = []
+        for review in reviews:
+            if last_reviews and last_reviews[-1].submit_id == review.submit_id:
+                last_reviews[-1] = review
+            else:
+                last_reviews.append(review)
+
+        scores = []
+        for review in last_reviews:
+            if review.submit.is_accepted == Submit.ACCEPTED:
+                scores.append((review.score, review))
+            elif review.submit.is_accepted == Submit.ACCEPTED_WITH_PENALIZATION \
+                    and aggregation == 'max_with_penalization':
+                scores.append((import_string(submit_settings.SUBMIT_PENALIZED_SCORE)(review), review))
+        if not scores:
+            return None
+        if aggregation == 'last_accepted':
+            return scores[-1]
+        # The earliest of equal best scores
+        return max(scores, key=lambda score: score[0])
+
+    def update_score(self, user_id, receiver_id):
+        """
+        Recomputes the score of the user for the receiver, called whenever their reviews or submits change.
+        """
+        from submit.scoreboard_helpers import update_scoreboards
+        score = self.compute_score(user_id, receiver_id)
+        with transaction.atomic():
+            if score is None:
+                self.filter(user=user_id, receiver=receiver_id).delete()
+            else:
+                self.update_or_create(user_id=user_id, receiver_id=receiver_id,
+                                      defaults={'score': score[0], 'review': score[1]})
+            task_id = SubmitReceiver.objects.filter(pk=receiver_id).values_list('task', flat=True).first()
+            if task_id is not None:
+                update_scoreboards(task_id, user_id)
+
+
+@python_2_unicode_compatible
+class UserReceiverScore(models.Model):
+    """
+    Score of a user for a receiver, kept up to date from their submits and reviews, so results can be computed
+    without scanning all reviews. See `SUBMIT_USER_RECEIVER_SCORE_AGGREGATION`, `review` is the review
+    the score comes from.
+    """
+    user = models.ForeignKey(django_settings.AUTH_USER_MODEL, related_name='+')
+    receiver = models.ForeignKey(SubmitReceiver, related_name='user_scores')
+    score = models.DecimalField(max_digits=10, decimal_places=5)
+    review = models.ForeignKey(Review, null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
+    updated = models.DateTimeField(auto_now=True)
+
+    objects = UserReceiverScoreManager()
+
+    class Meta:
+        verbose_name = 'user receiver score'
+        verbose_name_plural = 'user receiver scores'
+        unique_together = [('user', 'receiver')]
+        index_together = [('receiver', 'score')]
+
+    def __str__(self):
+        return '%s, %s: %s' % (self.user, self.receiver, self.score)
+
+
+def remove_unused_blob(sender, instance, **kwargs):
+    """
+    Blobs are reference counted by submits pointing to them, the last one removes the blob.
+    """
+    file_hash = instance.file_hash
+    if not file_hash:
+        return
+
+    def is_used():
+        return Submit.objects.filter(file_hash=file_hash).exists()
+    # A concurrent submit of the same content may find the blob before it is removed (see `create_submit`)
+    transaction.on_commit(lambda: storage.remove_unused_file(storage.blob_path(file_hash), is_used))
+
+
+def update_submit_of_deleted_review(sender, instance, **kwargs):
+    """
+    Submits of deleted reviews point to their previous reviews, scores of their users are recomputed.
+    """
+    Submit(pk=instance.submit_id).update_last_review()
+    submit = Submit.objects.filter(pk=instance.submit_id).values_list('user', 'receiver').first()
+    if submit is not None:
+        UserReceiverScore.objects.update_score(*submit)
+
+
+def update_score_of_deleted_submit(sender, instance, **kwargs):
+    UserReceiverScore.objects.update_score(instance.user_id, instance.receiver_id)
+
+
+post_delete.connect(remove_unused_blob, sender=Submit)
+post_delete.connect(update_submit_of_deleted_review, sender=Review)
+post_delete.connect(update_score_of_deleted_submit, sender=Submit)
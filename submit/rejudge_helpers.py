@@ -0,0 +1,64 @@
+import time
+
+from submit.constants import JudgePriority
+from submit.judge_helpers import JudgeConnectionError, create_review_and_send_to_judge
+from submit.models import RejudgeJob
+
+
+def start_rejudge_job(receiver, user, only_latest=False, submits_per_second=1.0):
+    job = RejudgeJob(receiver=receiver, created_by=user, only_latest=only_latest,
+                     submits_per_second=submits_per_second)
+    job.save()
+    job.total = job.submits().count()
+    job.save(update_fields=['total'])
+    return job
+
+
+def run_rejudge_job(job):
+    """
+    Sends the remaining submits of the job to judge, at most `job.submits_per_second` of them per second.
+    Progress is saved after every submit. Returns False if the job was paused before it finished.
+    """
+    started = RejudgeJob.objects \
+        .filter(pk=job.pk, status__in=[RejudgeJob.PENDING, RejudgeJob.RUNNING]) \
+        .update(status=RejudgeJob.RUNNING)
+    if not started:
+        return False
+
+    interval = 1.0 / job.submits_per_second if job.submits_per_second > 0 else 0
+    submits = job.submits().filter(pk__gt=job.last_submit_id).select_related('receiver', 'user')
+
+    for submit in submits.iterator():
+        if RejudgeJob.objects.filter(pk=job.pk, status=RejudgeJob.PAUSED).exists():
+            return False
+
+        started = time.time()
+        try:
+            create_review_and_send_to_judge(submit, priority=JudgePriority.LOW, force=True)
+            job.done += 1
+        except JudgeConnectionError:
+            job.failed += 1
+        job.last_submit_id = submit.pk
+        job.save(update_fields=['done', 'failed', 'last_submit_id'])
+
+        time.sleep(max(0, interval - (time.time() - started)))
+
+    job.status = RejudgeJob.FINISHED
+    job.save(update_fields=['status'])
+    return True
+
+
+def run_rejudge_jobs():
+    """
+    Runs pending jobs and resumes jobs interrupted while running. Returns the number of jobs processed.
+    """
+    jobs = RejudgeJob.objects \
+        .filter(status__in=[RejudgeJob.PENDING, RejudgeJob.RUNNING]) \
+        .select_related('receiver') \
+        .order_by('created', 'pk')
+
+    processed = 0
+    for job in jobs:
+        run_rejudge_job(job)
+        processed += 1
+    return processed
@@ -0,0 +1,183 @@
+import hashlib
+import random
+import threading
+import time
+from decimal import Decimal
+
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.encoding import force_text
+from django.utils.module_loading import import_string
+
+from submit import settings as submit_settings
+from submit.models import Review, UserReceiverScore
+
+# Scoreboards are merged from columns, one for each task: user id -> (user, score of the task).
+# Columns are cached in `SUBMIT_SCOREBOARD_CACHE` under versions of the tasks, a new score of a user increments
+# the version and patches the column of the previous version, so the whole column is not recomputed.
+# Versions are counters incremented atomically by the cache, a patched column is stored only if no other change
+# got in between, otherwise the column of the new version is computed when read.
+# Each process keeps the scoreboards it has read and merges them again only when a version changes.
+
+# scoreboard key -> (time of the last version check, versions, scoreboard)
+_memo = {}
+_MEMO_MAX_SIZE = 1000
+_memo_lock = threading.Lock()
+
+
+def _cache():
+    return caches[submit_settings.SUBMIT_SCOREBOARD_CACHE]
+
+
+def _version_key(task_id):
+    return 'submit:scoreboard:version:%s' % task_id
+
+
+def _column_key(task_id, version):
+    return 'submit:scoreboard:column:%s:%s' % (task_id, version)
+
+
+def _display_scores(scores):
+    """
+    Yields (user id, displayed score) of each `UserReceiverScore`, shown by `SUBMIT_DISPLAY_SCORE`.
+    """
+    reviews = Review.objects.in_bulk([score.review_id for score in scores if score.review_id is not None])
+    display_score = import_string(submit_settings.SUBMIT_DISPLAY_SCORE)
+    for score in scores:
+        review = reviews.get(score.review_id)
+        if review is None:
+            continue
+        # The aggregated score (e.g. penalized) is displayed in the context of the review it comes from
+        review.score = score.score
+        yield score.user_id, Decimal(str(display_score(review)))
+
+
+def compute_column(task_id, user_id=None):
+    """
+    Scores of all users (or of one user) for the task: user id -> (user, sum of scores of receivers of the task).
+    """
+    scores = UserReceiverScore.objects.filter(receiver__task=task_id).select_related('user')
+    if user_id is not None:
+        scores = scores.filter(user=user_id)
+    scores = list(scores)
+    users = dict((score.user_id, force_text(score.user)) for score in scores)
+    column = {}
+    for user_id, value in _display_scores(scores):
+        column[user_id] = (users[user_id], column.get(user_id, (None, Decimal(0)))[1] + value)
+    return column
+
+
+def _new_version():
+    # Random start, so columns of a version evicted from cache are never reused
+    return random.randint(0, 2 ** 62)
+
+
+def _update_column(task_id, user_id):
+    """
+    Moves the task to a new version. When the column of the previous version is cached and no other change
+    of the task got in between, the column is patched with the current score of the user.
+    """
+    cache = _cache()
+    old_version = cache.get(_version_key(task_id))
+    if old_version is None:
+        return
+    column = cache.get(_column_key(task_id, old_version))
+    try:
+        version = cache.incr(_version_key(task_id))
+    except ValueError:
+        # Evicted meanwhile, readers start a new version
+        return
+    if column is not None and version == old_version + 1:
+        column.pop(user_id, None)
+        column.update(compute_column(task_id, user_id))
+        cache.set(_column_key(task_id, version), column, submit_settings.SUBMIT_SCOREBOARD_CACHE_TIMEOUT)
+
+
+def update_scoreboards(task_id, user_id):
+    """
+    Called whenever a `UserReceiverScore` of the user for a receiver of the task changes,
+    scoreboards are updated after the current transaction is committed.
+    """
+    transaction.on_commit(lambda: _update_column(task_id, user_id))
+
+
+def _versions(task_ids):
+    """
+    Returns the current versions of the tasks, tasks without a version (e.g. evicted from cache) get a new one.
+    """
+    cache = _cache()
+    keys = [_version_key(task_id) for task_id in task_ids]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            versions[key] = _new_version()
+            if not cache.add(key, versions[key], None):
+                versions[key] = cache.get(key, versions[key])
+    return tuple(versions[key] for key in keys)
+
+
+def _columns(task_ids, versions):
+    """
+    Returns cached columns of the tasks in the given versions, missing columns are computed.
+    """
+    cache = _cache()
+    keys = [_column_key(task_id, version) for task_id, version in zip(task_ids, versions)]
+    columns = cache.get_many(keys)
+    for task_id, key in zip(task_ids, keys):
+        if key not in columns:
+            columns[key] = compute_column(task_id)
+            cache.set(key, columns[key], submit_settings.SUBMIT_SCOREBOARD_CACHE_TIMEOUT)
+    return [columns[key] for key in keys]
+
+
+def _merge(task_ids, columns, user_ids):
+    rows = {}
+    for task_id, column in zip(task_ids, columns):
+        for user_id, (user, value) in column.items():
+            if user_ids is not None and user_id not in user_ids:
+                continue
+            row = rows.setdefault(user_id, {'user_id': user_id, 'user': user, 'tasks': {}, 'total': Decimal(0)})
+            row['tasks'][task_id] = value
+            row['total'] += value
+    return sorted(rows.values(), key=lambda row: (-row['total'], row['user'], row['user_id']))
+
+
+def compute_scoreboard(task_ids, user_ids=None):
+    """
+    Returns rows of the scoreboard of the tasks (for the users, or all users with a score) ordered by the total
+    score: dicts with 'user_id', 'user', 'tasks' (task id -> score) and 'total'. Scores of receivers are taken
+    from `UserReceiverScore` and shown by `SUBMIT_DISPLAY_SCORE`, the score of a task is the sum for its receivers.
+    """
+    task_ids = [force_text(task_id) for task_id in task_ids]
+    return _merge(task_ids, [compute_column(task_id) for task_id in task_ids],
+                  set(user_ids) if user_ids is not None else None)
+
+
+def get_scoreboard(task_ids, user_ids=None):
+    """
+    Returns `compute_scoreboard(task_ids, user_ids)` merged from cached columns of the tasks.
+    Each process checks whether the scoreboards it has read are still valid at most once
+    per `SUBMIT_SCOREBOARD_CHECK_INTERVAL` seconds, so most reads need no cache access.
+    The returned scoreboard is shared, it must not be modified.
+    """
+    task_ids = sorted(set(force_text(task_id) for task_id in task_ids))
+    user_ids = set(user_ids) if user_ids is not None else None
+    users_key = ','.join(sorted(str(user_id) for user_id in user_ids)) if user_ids is not None else '*'
+    key = hashlib.sha1(('%s|%s' % (','.join(task_ids), users_key)).encode('utf-8')).hexdigest()
+    now = time.time()
+
+    memo = _memo.get(key)
+    if memo is not None and now - memo[0] < submit_settings.SUBMIT_SCOREBOARD_CHECK_INTERVAL:
+        return memo[2]
+
+    versions = _versions(task_ids)
+    if memo is not None and memo[1] == versions:
+        scoreboard = memo[2]
+    else:
+        scoreboard = _merge(task_ids, _columns(task_ids, versions), user_ids)
+
+    with _memo_lock:
+        if len(_memo) >= _MEMO_MAX_SIZE:
+            _memo.clear()
+        _memo[key] = (now, versions, scoreboard)
+    return scoreboard
@@ -19,3 +19,11 @@ class ExternalSubmitSerializer(serializers.Serializer):
         except ObjectDoesNotExist:
             raise serializers.ValidationError('Token does not belong to any submit receiver.')
         return value
+
+
+class ProtocolSerializer(serializers.Serializer):
+    """
+    One testing protocol posted by judge to the batch endpoint.
+    """
+    submit_id = serializers.IntegerField()
+    protocol = serializers.CharField(trim_whitespace=False)
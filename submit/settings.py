@@ -5,6 +5,20 @@ SUBMIT_TASK_MODEL = getattr(django_settings, 'SUBMIT_TASK_MODEL', 'submit.BaseTa
 # All submit files will be stored here
 SUBMIT_PATH = getattr(django_settings, 'SUBMIT_PATH', 'submit/')
 
+# Storage of all submit files, a dotted path of a Storage class (created with SUBMIT_STORAGE_OPTIONS),
+# None means the local file system in SUBMIT_PATH. Paths of files are relative to SUBMIT_PATH in any storage.
+SUBMIT_STORAGE = getattr(django_settings, 'SUBMIT_STORAGE', None)
+SUBMIT_STORAGE_OPTIONS = getattr(django_settings, 'SUBMIT_STORAGE_OPTIONS', {})
+
+# Store new files of these types compressed, SUBMIT_COMPRESSION can be None, 'gzip' or 'zstd'
+# ('zstd' requires package zstandard, gzip is used when it is not installed)
+SUBMIT_COMPRESSION = getattr(django_settings, 'SUBMIT_COMPRESSION', None)
+SUBMIT_COMPRESSED_FILE_TYPES = getattr(django_settings, 'SUBMIT_COMPRESSED_FILE_TYPES',
+                                       ('.submit', '.review', '.protocol', '.raw'))
+
+# Store submitted files with equal content only once (in /SUBMIT_PATH/blobs/), only new submits are affected
+SUBMIT_DEDUPLICATE_FILES = getattr(django_settings, 'SUBMIT_DEDUPLICATE_FILES', False)
+
 # When downloading submit/review files, these types should open in browser
 SUBMIT_VIEWABLE_EXTENSIONS = getattr(django_settings, 'SUBMIT_VIEWABLE_EXTENSIONS', ('.pdf', '.txt'))
 
@@ -12,6 +26,63 @@ JUDGE_INTERFACE_IDENTITY = getattr(django_settings, 'JUDGE_INTERFACE_IDENTITY',
 JUDGE_ADDRESS = getattr(django_settings, 'JUDGE_ADDRESS', '127.0.0.1')
 JUDGE_PORT = getattr(django_settings, 'JUDGE_PORT', 12347)
 
+# Submits are distributed among these (address, port) judge endpoints
+JUDGE_ENDPOINTS = getattr(django_settings, 'JUDGE_ENDPOINTS', [(JUDGE_ADDRESS, JUDGE_PORT)])
+JUDGE_CONNECTION_TIMEOUT = getattr(django_settings, 'JUDGE_CONNECTION_TIMEOUT', 10)
+# Endpoints that failed to connect are out of rotation and probed again after this number of seconds
+JUDGE_ENDPOINT_PROBE_INTERVAL = getattr(django_settings, 'JUDGE_ENDPOINT_PROBE_INTERVAL', 30)
+# Maximum number of reviews in testing (sent to judge, without protocol) per endpoint, None means no limit.
+# Over the limit reviews wait in the queue for `manage.py dispatch_to_judge`.
+# Reviews without protocol for JUDGE_IN_FLIGHT_TIMEOUT seconds are not counted anymore, reviews claimed for sending
+# but not sent within it (the sending process died) are retried as if judge was unavailable.
+JUDGE_MAX_IN_FLIGHT = getattr(django_settings, 'JUDGE_MAX_IN_FLIGHT', None)
+JUDGE_IN_FLIGHT_TIMEOUT = getattr(django_settings, 'JUDGE_IN_FLIGHT_TIMEOUT', 600)
+# Store data sent to judge as a .raw file next to the submit (for debugging)
+JUDGE_WRITE_RAW_FILE = getattr(django_settings, 'JUDGE_WRITE_RAW_FILE', False)
+
+# Reviews with response "Judge unavailable" are retried by `manage.py dispatch_to_judge` with exponential backoff
+# (delays in seconds), at most JUDGE_RETRY_MAX_CONCURRENT of them at once
+JUDGE_RETRY_MAX_ATTEMPTS = getattr(django_settings, 'JUDGE_RETRY_MAX_ATTEMPTS', 10)
+JUDGE_RETRY_BASE_DELAY = getattr(django_settings, 'JUDGE_RETRY_BASE_DELAY', 30)
+JUDGE_RETRY_MAX_DELAY = getattr(django_settings, 'JUDGE_RETRY_MAX_DELAY', 3600)
+JUDGE_RETRY_MAX_CONCURRENT = getattr(django_settings, 'JUDGE_RETRY_MAX_CONCURRENT', 5)
+
+# Receivers skipping identical resubmits compare a new file with files of at most this number of latest earlier
+# submits of the user, files deduplicated by SUBMIT_DEDUPLICATE_FILES are found by their hash regardless of it
+JUDGE_IDENTICAL_RESUBMITS_MAX_COMPARED = getattr(django_settings, 'JUDGE_IDENTICAL_RESUBMITS_MAX_COMPARED', 10)
+
+# When set, views only queue reviews for judge and `manage.py dispatch_to_judge` sends them in a separate process
+JUDGE_DISPATCH_IN_BACKGROUND = getattr(django_settings, 'JUDGE_DISPATCH_IN_BACKGROUND', False)
+# Queued reviews are dispatched by priority (submit, rejudge, bulk rejudge), but reviews waiting longer
+# than this number of seconds get up to half of every dispatched batch
+JUDGE_DISPATCH_STARVATION_TIMEOUT = getattr(django_settings, 'JUDGE_DISPATCH_STARVATION_TIMEOUT', 300)
+
+# Parsed testing protocols are stored in this cache (alias from CACHES) for the given number of seconds
+SUBMIT_PROTOCOL_CACHE = getattr(django_settings, 'SUBMIT_PROTOCOL_CACHE', 'default')
+SUBMIT_PROTOCOL_CACHE_TIMEOUT = getattr(django_settings, 'SUBMIT_PROTOCOL_CACHE_TIMEOUT', 24 * 60 * 60)
+# Parse protocols as a stream of elements, keeps memory usage bounded for protocols with thousands of tests
+SUBMIT_PROTOCOL_STREAMING_PARSER = getattr(django_settings, 'SUBMIT_PROTOCOL_STREAMING_PARSER', False)
+# Details of each test are truncated to this number of characters, None means no limit
+SUBMIT_PROTOCOL_DETAILS_MAX_LENGTH = getattr(django_settings, 'SUBMIT_PROTOCOL_DETAILS_MAX_LENGTH', None)
+
+# Scores of users for receivers (UserReceiverScore) are aggregated from the last finished reviews of their submits:
+# 'last_accepted' (the last accepted submit), 'max' (the best accepted submit) or 'max_with_penalization'
+# (also submits accepted with penalization count, with the score given by SUBMIT_PENALIZED_SCORE).
+# After changing it run `manage.py rebuild_user_receiver_scores`
+SUBMIT_USER_RECEIVER_SCORE_AGGREGATION = getattr(django_settings, 'SUBMIT_USER_RECEIVER_SCORE_AGGREGATION',
+                                                 'last_accepted')
+
+# Scoreboards (`scoreboard_helpers.get_scoreboard`) are cached in this cache (alias from CACHES) for the given
+# number of seconds, each process rechecks whether its scoreboards are still valid every CHECK_INTERVAL seconds.
+# The cache must be shared by all processes (e.g. memcached or redis), with a local-memory cache
+# other processes would not see new scores.
+SUBMIT_SCOREBOARD_CACHE = getattr(django_settings, 'SUBMIT_SCOREBOARD_CACHE', 'default')
+SUBMIT_SCOREBOARD_CACHE_TIMEOUT = getattr(django_settings, 'SUBMIT_SCOREBOARD_CACHE_TIMEOUT', 24 * 60 * 60)
+SUBMIT_SCOREBOARD_CHECK_INTERVAL = getattr(django_settings, 'SUBMIT_SCOREBOARD_CHECK_INTERVAL', 1)
+
+# The submit list (templatetag `submit_list`) shows this number of submits, older ones are loaded on demand
+SUBMIT_LIST_PAGE_SIZE = getattr(django_settings, 'SUBMIT_LIST_PAGE_SIZE', 20)
+
 # For more information about these function see defaults.py
 JUDGE_DEFAULT_INPUTS_FOLDER_FOR_RECEIVER = getattr(django_settings, 'JUDGE_DEFAULT_INPUTS_FOLDER_FOR_RECEIVER',
                                                    'submit.defaults.default_inputs_folder_at_judge')
@@ -22,6 +93,7 @@ SUBMIT_PREFETCH_DATA_FOR_SCORE_CALCULATION = getattr(django_settings,
                                                      'SUBMIT_PREFETCH_DATA_FOR_SCORE_CALCULATION',
                                                      'submit.defaults.prefetch_data_for_score_calculation')
 SUBMIT_DISPLAY_SCORE = getattr(django_settings, 'SUBMIT_DISPLAY_SCORE', 'submit.defaults.display_score')
+SUBMIT_PENALIZED_SCORE = getattr(django_settings, 'SUBMIT_PENALIZED_SCORE', 'submit.defaults.penalized_score')
 SUBMIT_RENDER_REVIEW_COMMENT = getattr(django_settings, 'SUBMIT_RENDER_REVIEW_COMMENT',
                                        'submit.defaults.render_review_comment')
 SUBMIT_DISPLAY_SUBMIT_RECEIVER_NAME = getattr(django_settings, 'SUBMIT_DISPLAY_SUBMIT_RECEIVER_NAME',
@@ -30,6 +102,10 @@ SUBMIT_CAN_POST_SUBMIT = getattr(django_settings, 'SUBMIT_CAN_POST_SUBMIT',
                                  'submit.defaults.can_post_submit')
 SUBMIT_HAS_ADMIN_PRIVILEGES_FOR_RECEIVER = getattr(django_settings, 'SUBMIT_HAS_ADMIN_PRIVILEGES_FOR_RECEIVER',
                                                    'submit.defaults.has_admin_privileges_for_receiver')
+SUBMIT_CAN_VIEW_SCOREBOARD = getattr(django_settings, 'SUBMIT_CAN_VIEW_SCOREBOARD',
+                                     'submit.defaults.can_view_scoreboard')
+# After changing the layout, move existing files with `manage.py relayout_submit_files`
+SUBMIT_DIR_PATH_FUNCTION = getattr(django_settings, 'SUBMIT_DIR_PATH_FUNCTION', 'submit.defaults.submit_dir_path')
 
 SUBMIT_RECEIVER_TEMPLATES = getattr(django_settings, 'SUBMIT_RECEIVER_TEMPLATES', {
     'Source': {
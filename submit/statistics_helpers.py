@@ -0,0 +1,45 @@
+from django.db.models import Avg, Case, Count, ExpressionWrapper, F, IntegerField, Max, Min, Sum, Value, When
+
+from submit.constants import JudgeTestResult
+from submit.models import ReviewTestResult
+
+
+def test_pass_rates(receiver):
+    """
+    For each test of the receiver returns the number of runs, the number of passed runs and the pass rate,
+    ordered from the most often failing test. Ignored tests are not counted.
+    """
+    rows = ReviewTestResult.objects.filter(receiver=receiver).exclude(
+        result=JudgeTestResult.IGNORED,
+    ).values('name').annotate(
+        runs=Count('id'),
+        passed=Sum(Case(When(result=JudgeTestResult.OK, then=Value(1)), default=Value(0),
+                        output_field=IntegerField())),
+    ).order_by('name')
+    stats = []
+    for row in rows:
+        row['pass_rate'] = float(row['passed']) / row['runs']
+        stats.append(row)
+    stats.sort(key=lambda row: row['pass_rate'])
+    return stats
+
+
+def test_time_summary(receiver, name):
+    """
+    Minimal, average and maximal running time (in milliseconds) of one test of the receiver.
+    """
+    return ReviewTestResult.objects.filter(receiver=receiver, name=name, time__isnull=False).aggregate(
+        runs=Count('id'), min_time=Min('time'), avg_time=Avg('time'), max_time=Max('time'),
+    )
+
+
+def test_time_distribution(receiver, name, bucket_size=100):
+    """
+    Histogram of running times of one test of the receiver, as a list of (bucket start, number of runs).
+    Buckets are computed by the database.
+    """
+    bucket = ExpressionWrapper(F('time') / bucket_size, output_field=IntegerField())
+    rows = ReviewTestResult.objects.filter(receiver=receiver, name=name, time__isnull=False).annotate(
+        bucket=bucket,
+    ).values('bucket').annotate(runs=Count('id')).order_by('bucket')
+    return [(row['bucket'] * bucket_size, row['runs']) for row in rows]
@@ -0,0 +1,569 @@
+import gzip
+import hashlib
+import os
+import shutil
+import tempfile
+import uuid
+import zlib
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from submit import constants
+from submit import settings as submit_settings
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+_storages = {}
+
+
+def get_storage():
+    """
+    Returns the storage of all submit files: `SUBMIT_STORAGE` created with `SUBMIT_STORAGE_OPTIONS`,
+    by default the local file system in `SUBMIT_PATH`.
+    """
+    key = (submit_settings.SUBMIT_STORAGE, submit_settings.SUBMIT_PATH)
+    if key not in _storages:
+        if submit_settings.SUBMIT_STORAGE is None:
+            _storages[key] = FileSystemStorage(location=submit_settings.SUBMIT_PATH)
+        else:
+            _storages[key] = import_string(submit_settings.SUBMIT_STORAGE)(**submit_settings.SUBMIT_STORAGE_OPTIONS)
+    return _storages[key]
+
+
+def storage_name(file_path):
+    """
+    Files are addressed by their paths in `SUBMIT_PATH` (e.g. `submit.file_path()`),
+    returns the name of the file in storage.
+    """
+    return os.path.relpath(file_path, submit_settings.SUBMIT_PATH).replace(os.sep, '/')
+
+
+def local_path(file_path):
+    """
+    Returns the path of the file in the local file system, or None if the storage is not local.
+    """
+    try:
+        return get_storage().path(storage_name(file_path))
+    except NotImplementedError:
+        return None
+
+
+def _compression_for(extension):
+    """
+    Returns the compression format new files with this extension should be stored in, or None.
+    """
+    compression = submit_settings.SUBMIT_COMPRESSION
+    if compression is None or extension not in submit_settings.SUBMIT_COMPRESSED_FILE_TYPES:
+        return None
+    if compression == 'zstd' and zstandard is None:
+        return 'gzip'
+    return compression
+
+
+def _stored_variants(file_path):
+    return [file_path + compression_extension
+            for compression_extension in ('',) + tuple(constants.COMPRESSION_EXTENSIONS.values())]
+
+
+def _packed_file(file_path):
+    """
+    Returns the index entry of the file packed into an archive by `manage.py pack_submit_files`, or None.
+    """
+    from submit.models import PackedFile
+    names = [storage_name(stored_path) for stored_path in _stored_variants(file_path)]
+    packed_files = {packed.name: packed for packed in PackedFile.objects.filter(name__in=names)}
+    for name in names:
+        if name in packed_files:
+            return packed_files[name]
+    return None
+
+
+def _find(file_path):
+    """
+    Returns (stored_path, packed_file) of the file: loose files are preferred over files packed into an archive,
+    packed_file is None for loose files. Returns (None, None) if there is no such file.
+    """
+    storage = get_storage()
+    for stored_path in _stored_variants(file_path):
+        if storage.exists(storage_name(stored_path)):
+            return stored_path, None
+    packed_file = _packed_file(file_path)
+    if packed_file is not None:
+        return os.path.join(submit_settings.SUBMIT_PATH, packed_file.name), packed_file
+    return None, None
+
+
+def stored_file_path(file_path):
+    """
+    Files may be stored compressed, with an additional extension. Returns the path of the stored file or None.
+    """
+    return _find(file_path)[0]
+
+
+def file_exists(file_path):
+    return stored_file_path(file_path) is not None
+
+
+def is_compressed(stored_path):
+    return os.path.splitext(stored_path)[1] in constants.COMPRESSION_EXTENSIONS.values()
+
+
+def direct_local_path(file_path):
+    """
+    Returns the local path of the file if its data can be read directly from there (e.g. by sendfile),
+    None if the file is compressed, packed into an archive or not stored locally.
+    """
+    stored_path, packed_file = _find(file_path)
+    if stored_path is None or packed_file is not None or is_compressed(stored_path):
+        return None
+    return local_path(stored_path)
+
+
+def _stored_size(stored_path, packed_file):
+    if packed_file is not None:
+        return packed_file.size
+    return get_storage().size(storage_name(stored_path))
+
+
+def file_size(file_path):
+    """
+    Returns the size of the stored (possibly compressed) file or None.
+    """
+    stored_path, packed_file = _find(file_path)
+    if stored_path is None:
+        return None
+    return _stored_size(stored_path, packed_file)
+
+
+def file_version(file_path):
+    """
+    Returns a string which changes whenever the stored file is changed, or None if there is no such file.
+    """
+    stored_path, packed_file = _find(file_path)
+    if stored_path is None:
+        return None
+    if packed_file is not None:
+        return '%s:%s:%d' % (stored_path, packed_file.archive, packed_file.offset)
+
+    path = local_path(stored_path)
+    if path is not None:
+        stat = os.stat(path)
+        return '%s:%r:%d' % (stored_path, stat.st_mtime, stat.st_size)
+
+    storage = get_storage()
+    name = storage_name(stored_path)
+    # Storage.modified_time was replaced by get_modified_time in Django 1.10
+    get_modified_time = getattr(storage, 'get_modified_time', None) or storage.modified_time
+    return '%s:%s:%d' % (stored_path, get_modified_time(name).isoformat(), storage.size(name))
+
+
+class _DecompressedFile(object):
+    """
+    Reads decompressed data of a stored file, closing it closes also the stored file.
+    """
+    def __init__(self, decompressed, stored):
+        self.decompressed = decompressed
+        self.stored = stored
+
+    def read(self, size=-1):
+        return self.decompressed.read(size)
+
+    def close(self):
+        self.decompressed.close()
+        self.stored.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class _ArchivedFile(object):
+    """
+    Reads one file packed into an archive: `size` bytes from `offset`, by seeking in the opened archive.
+    """
+    def __init__(self, archive, offset, size):
+        self.archive = archive
+        self.offset = offset
+        self.size = size
+        self.position = 0
+        archive.seek(offset)
+
+    def read(self, size=-1):
+        if size is None or size < 0 or size > self.size - self.position:
+            size = self.size - self.position
+        data = self.archive.read(size)
+        self.position += len(data)
+        return data
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        if whence == os.SEEK_CUR:
+            offset += self.position
+        elif whence == os.SEEK_END:
+            offset += self.size
+        self.position = min(max(offset, 0), self.size)
+        self.archive.seek(self.offset + self.position)
+        return self.position
+
+    def tell(self):
+        return self.position
+
+    def close(self):
+        self.archive.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def _open_stored(stored_path, packed_file):
+    storage = get_storage()
+    if packed_file is not None:
+        return _ArchivedFile(storage.open(packed_file.archive, 'rb'), packed_file.offset, packed_file.size)
+    return storage.open(storage_name(stored_path), 'rb')
+
+
+def open_file(file_path):
+    """
+    Opens a (possibly compressed or packed) file for reading, the returned file yields the original data.
+    """
+    stored_path, packed_file = _find(file_path)
+    if stored_path is None:
+        raise IOError('File %s does not exist.' % file_path)
+
+    extension = os.path.splitext(stored_path)[1]
+    if extension == constants.COMPRESSION_EXTENSIONS['zstd'] and zstandard is None:
+        raise IOError('Package zstandard is required to read %s.' % stored_path)
+
+    stored = _open_stored(stored_path, packed_file)
+    if extension == constants.COMPRESSION_EXTENSIONS['gzip']:
+        return _DecompressedFile(gzip.GzipFile(fileobj=stored, mode='rb'), stored)
+    if extension == constants.COMPRESSION_EXTENSIONS['zstd']:
+        return _DecompressedFile(zstandard.ZstdDecompressor().stream_reader(stored), stored)
+    return stored
+
+
+def files_equal(file_path, other_file_path):
+    """
+    Compares contents of two (possibly compressed) files.
+    """
+    stored_path, packed_file = _find(file_path)
+    other_stored_path, other_packed_file = _find(other_file_path)
+    if stored_path is None or other_stored_path is None:
+        return False
+    if not is_compressed(stored_path) and not is_compressed(other_stored_path) and \
+            _stored_size(stored_path, packed_file) != _stored_size(other_stored_path, other_packed_file):
+        return False
+
+    with open_file(file_path) as stored, open_file(other_file_path) as other:
+        while True:
+            chunk = stored.read(constants.FILE_CHUNK_SIZE)
+            if chunk != other.read(constants.FILE_CHUNK_SIZE):
+                return False
+            if not chunk:
+                return True
+
+
+def _compressor(compression):
+    if compression == 'gzip':
+        return zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    if compression == 'zstd':
+        return zstandard.ZstdCompressor().compressobj()
+    return None
+
+
+def _makedirs(directory):
+    try:
+        os.makedirs(directory)
+    except os.error:
+        pass
+
+
+def _write_compressed(destination, chunks, compression):
+    compressor = _compressor(compression)
+    for chunk in chunks:
+        destination.write(compressor.compress(chunk) if compressor is not None else chunk)
+    if compressor is not None:
+        destination.write(compressor.flush())
+
+
+def _write_temp_file(temp_path, chunks, compression):
+    """
+    Writes chunks to temp_path, the file is removed if writing fails.
+    """
+    try:
+        with open(temp_path, 'wb') as destination:
+            _write_compressed(destination, chunks, compression)
+    except:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def _write_atomically(stored_path, chunks, compression):
+    """
+    Writes chunks to a temporary file which then replaces stored_path, readers never see a partially written file.
+    """
+    temp_path = '%s.%s.tmp' % (stored_path, uuid.uuid4().hex)
+    _write_temp_file(temp_path, chunks, compression)
+    os.rename(temp_path, stored_path)
+
+
+def _save(stored_path, content):
+    """
+    Saves content (a file) to a storage which is not local, replacing the stored file.
+    """
+    storage = get_storage()
+    name = storage_name(stored_path)
+    # Storage.save never overwrites, it would choose another name
+    if storage.exists(name):
+        storage.delete(name)
+    storage.save(name, File(content))
+
+
+def _write(stored_path, chunks, compression):
+    path = local_path(stored_path)
+    if path is not None:
+        _makedirs(os.path.dirname(path))
+        _write_atomically(path, chunks, compression)
+    else:
+        with tempfile.TemporaryFile() as temp_file:
+            _write_compressed(temp_file, chunks, compression)
+            temp_file.seek(0)
+            _save(stored_path, temp_file)
+
+
+def write_chunks_to_file(file_path, chunks):
+    """
+    Stores data to file_path, compressed according to `SUBMIT_COMPRESSION`.
+    Other (differently compressed) versions of the file are removed.
+    """
+    compression = _compression_for(os.path.splitext(file_path)[1])
+    stored_path = file_path + constants.COMPRESSION_EXTENSIONS.get(compression, '')
+    _write(stored_path, chunks, compression)
+
+    for other_stored_path in _stored_variants(file_path):
+        if other_stored_path != stored_path:
+            _delete(other_stored_path)
+
+
+def append_to_file(file_path, data):
+    """
+    Appends data to an uncompressed file, with a single write to a local file.
+    Objects in other storages can not be appended to, they are replaced.
+    """
+    path = local_path(file_path)
+    if path is not None:
+        _makedirs(os.path.dirname(path))
+        with open(path, 'ab') as destination:
+            destination.write(data)
+        return
+
+    with tempfile.TemporaryFile() as temp_file:
+        if file_exists(file_path):
+            with open_file(file_path) as stored:
+                temp_file.write(stored.read())
+        temp_file.write(data)
+        temp_file.seek(0)
+        _save(file_path, temp_file)
+
+
+def _delete(stored_path):
+    storage = get_storage()
+    name = storage_name(stored_path)
+    if storage.exists(name):
+        storage.delete(name)
+
+
+def remove_empty_directories(directory):
+    """
+    Removes the local directory and its parents, up to `SUBMIT_PATH`, while they are empty.
+    """
+    root = os.path.abspath(submit_settings.SUBMIT_PATH)
+    while os.path.abspath(directory).startswith(root + os.sep):
+        try:
+            os.rmdir(directory)
+        except OSError:
+            break
+        directory = os.path.dirname(directory)
+
+
+def remove_file(file_path):
+    """
+    Removes the file, whether it is stored compressed or not.
+    Files packed into an archive are removed from its index, their data stay in the archive.
+    """
+    from submit.models import PackedFile
+    stored_paths = _stored_variants(file_path)
+    for stored_path in stored_paths:
+        _delete(stored_path)
+    PackedFile.objects.filter(name__in=[storage_name(stored_path) for stored_path in stored_paths]).delete()
+
+
+def remove_unused_file(file_path, is_used):
+    """
+    Removes the file (see `remove_file`) unless `is_used()`. Someone may find the file just before it is removed
+    and start using it after the first check, so `is_used` is checked again once the file is removed
+    and the file is restored if it became used meanwhile.
+    """
+    from submit.models import PackedFile
+    if is_used():
+        return
+    storage = get_storage()
+    stored_paths = [stored_path for stored_path in _stored_variants(file_path)
+                    if storage.exists(storage_name(stored_path))]
+    packed_files = list(PackedFile.objects.filter(name__in=[storage_name(stored_path)
+                                                            for stored_path in _stored_variants(file_path)]))
+    with tempfile.TemporaryFile() as copy:
+        if stored_paths:
+            with storage.open(storage_name(stored_paths[0]), 'rb') as stored:
+                shutil.copyfileobj(stored, copy)
+        remove_file(file_path)
+        if not is_used():
+            return
+
+        if stored_paths:
+            copy.seek(0)
+            _write(stored_paths[0], iter(lambda: copy.read(constants.FILE_CHUNK_SIZE), b''), None)
+        for packed_file in packed_files:
+            PackedFile.objects.get_or_create(name=packed_file.name, defaults={
+                'archive': packed_file.archive, 'offset': packed_file.offset, 'size': packed_file.size,
+            })
+
+
+def blob_path(file_hash):
+    """
+    Submitted files with equal content are stored once, as /settings.SUBMIT_PATH/blobs/ab/cd/abcd...ef.submit
+    """
+    return os.path.join(submit_settings.SUBMIT_PATH, 'blobs', file_hash[:2], file_hash[2:4],
+                        file_hash + constants.SUBMITTED_FILE_EXTENSION)
+
+
+def write_blob(chunks):
+    """
+    Stores data to the blob store and returns their SHA-256 hash. Data are hashed while they are written,
+    if a blob with the same content already exists, the new copy is discarded.
+    """
+    sha256 = hashlib.sha256()
+
+    def hashed_chunks():
+        for chunk in chunks:
+            sha256.update(chunk)
+            yield chunk
+
+    compression = _compression_for(constants.SUBMITTED_FILE_EXTENSION)
+    compression_extension = constants.COMPRESSION_EXTENSIONS.get(compression, '')
+    directory = local_path(os.path.join(submit_settings.SUBMIT_PATH, 'blobs'))
+    if directory is None:
+        with tempfile.TemporaryFile() as temp_file:
+            _write_compressed(temp_file, hashed_chunks(), compression)
+            file_hash = sha256.hexdigest()
+            if not file_exists(blob_path(file_hash)):
+                temp_file.seek(0)
+                _save(blob_path(file_hash) + compression_extension, temp_file)
+        return file_hash
+
+    _makedirs(directory)
+    temp_path = os.path.join(directory, '%s.tmp' % uuid.uuid4().hex)
+    _write_temp_file(temp_path, hashed_chunks(), compression)
+
+    file_hash = sha256.hexdigest()
+    if file_exists(blob_path(file_hash)):
+        os.remove(temp_path)
+    else:
+        path = local_path(blob_path(file_hash) + compression_extension)
+        _makedirs(os.path.dirname(path))
+        os.rename(temp_path, path)
+    return file_hash
+
+
+def compress_file(file_path, compression):
+    """
+    Replaces an uncompressed local file by its compressed version. Returns False if there was nothing to compress.
+    """
+    if not os.path.exists(file_path) or is_compressed(file_path):
+        return False
+    with open(file_path, 'rb') as source:
+        chunks = iter(lambda: source.read(constants.FILE_CHUNK_SIZE), b'')
+        _write_atomically(file_path + constants.COMPRESSION_EXTENSIONS[compression], chunks, compression)
+    os.remove(file_path)
+    return True
+
+
+def pack_files(archive_path, file_paths):
+    """
+    Packs loose stored files into one archive (stored files are concatenated) and indexes them by `PackedFile`s.
+    Every file is verified by comparing SHA-256 of its data read back from the archive, only then the file is
+    added to the index and its loose version is removed. Files which do not exist or are already packed are skipped,
+    a file listed more times (e.g. a blob shared by deduplicated submits) is packed once.
+    Returns the number of packed files.
+    """
+    from submit.models import PackedFile
+    storage = get_storage()
+    stored_paths = []
+    seen = set()
+    for file_path in file_paths:
+        stored_path, packed_file = _find(file_path)
+        if stored_path is not None and packed_file is None and storage_name(stored_path) not in seen:
+            seen.add(storage_name(stored_path))
+            stored_paths.append(stored_path)
+    if not stored_paths:
+        return 0
+
+    entries = []
+
+    def chunks():
+        offset = 0
+        for stored_path in stored_paths:
+            sha256 = hashlib.sha256()
+            size = 0
+            with storage.open(storage_name(stored_path), 'rb') as stored:
+                for chunk in iter(lambda: stored.read(constants.FILE_CHUNK_SIZE), b''):
+                    sha256.update(chunk)
+                    size += len(chunk)
+                    yield chunk
+            entries.append((stored_path, offset, size, sha256.hexdigest()))
+            offset += size
+
+    _write(archive_path, chunks(), None)
+
+    archive = storage_name(archive_path)
+    corrupted = None
+    with storage.open(archive, 'rb') as archive_file:
+        for stored_path, offset, size, file_hash in entries:
+            archived = _ArchivedFile(archive_file, offset, size)
+            sha256 = hashlib.sha256()
+            for chunk in iter(lambda: archived.read(constants.FILE_CHUNK_SIZE), b''):
+                sha256.update(chunk)
+            if sha256.hexdigest() != file_hash:
+                corrupted = stored_path
+                break
+    if corrupted is not None:
+        _delete(archive_path)
+        raise IOError('File %s was not packed correctly into %s.' % (corrupted, archive_path))
+
+    try:
+        with transaction.atomic():
+            PackedFile.objects.bulk_create([
+                PackedFile(name=storage_name(stored_path), archive=archive, offset=offset, size=size)
+                for stored_path, offset, size, _ in entries
+            ], batch_size=500)
+    except Exception:
+        # Nothing is read from an archive which is not indexed, loose files are kept
+        _delete(archive_path)
+        raise
+    for stored_path, _, _, _ in entries:
+        _delete(stored_path)
+        path = local_path(stored_path)
+        if path is not None:
+            remove_empty_directories(os.path.dirname(path))
+    return len(entries)
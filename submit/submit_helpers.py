@@ -1,12 +1,17 @@
+import mimetypes
 import os
 
-from django.http import Http404
+from django.db import transaction
+from django.db.models import Q
+from django.http import FileResponse, Http404
+from django.utils.dateparse import parse_datetime
 from django.utils.module_loading import import_string
 from sendfile import sendfile
 
 from submit import constants
 from submit import settings as submit_settings
 from submit.models import Submit
+from submit.storage import direct_local_path, file_exists, open_file, write_blob, write_chunks_to_file
 
 
 def add_language_preference_to_filename(filename, language_preference, allowed_languages):
@@ -33,17 +38,6 @@ def add_language_preference_to_filename(filename, language_preference, allowed_l
     return ''.join((name, extension))
 
 
-def write_chunks_to_file(file_path, chunks):
-    try:
-        os.makedirs(os.path.dirname(file_path))
-    except os.error:
-        pass
-
-    with open(file_path, 'wb+') as destination:
-        for chunk in chunks:
-            destination.write(chunk)
-
-
 def create_submit(user, receiver, sfile=None):
     """
     Use this function to create submits so that is_accepted field is set and submitted file is saved properly.
@@ -54,26 +48,72 @@ def create_submit(user, receiver, sfile=None):
     submit.is_accepted = import_string(submit_settings.SUBMIT_IS_SUBMIT_ACCEPTED)(submit)
     submit.save()
     if sfile is not None:
-        write_chunks_to_file(submit.file_path(), sfile.chunks())
+        if submit_settings.SUBMIT_DEDUPLICATE_FILES:
+            submit.file_hash = write_blob(sfile.chunks())
+            submit.save(update_fields=['file_hash'])
+
+            # `write_blob` may have reused a blob which is being removed with the last submit pointing to it,
+            # the removal does not see this file_hash before it is committed, the blob is written again then
+            def ensure_blob():
+                if not file_exists(submit.file_path()):
+                    write_blob(sfile.chunks())
+            transaction.on_commit(ensure_blob)
+        else:
+            write_chunks_to_file(submit.file_path(), sfile.chunks())
     return submit
 
 
+def _submit_list_cursor(submit):
+    return '%s_%d' % (submit.time.isoformat(), submit.pk)
+
+
+def _parse_submit_list_cursor(cursor):
+    time, _, pk = cursor.rpartition('_')
+    time = parse_datetime(time)
+    if time is None:
+        raise ValueError('Invalid cursor: %r' % cursor)
+    return time, int(pk)
+
+
+def get_submit_list_page(receiver, user, after=None):
+    """
+    Returns a page of `SUBMIT_LIST_PAGE_SIZE` submits of the user for the receiver (newest first, with their last
+    reviews) and the cursor of the next page, None if there are no older submits.
+    Pages are delimited by (time, pk) of submits, `after` is the cursor returned with the previous page,
+    so loading a page does not depend on the number of older submits. Raises ValueError for an invalid cursor.
+    """
+    page_size = submit_settings.SUBMIT_LIST_PAGE_SIZE
+    submits = Submit.with_reviews.filter(receiver=receiver, user=user).order_by('-time', '-pk')
+    if after is not None:
+        time, pk = _parse_submit_list_cursor(after)
+        submits = submits.filter(Q(time__lt=time) | Q(time=time, pk__lt=pk))
+    # One more submit tells whether there is a next page
+    submits = list(submits[:page_size + 1])
+    if len(submits) > page_size:
+        return submits[:page_size], _submit_list_cursor(submits[page_size - 1])
+    return submits, None
+
+
 def send_file(request, filepath, filename):
     """
     Send file requested to be downloaded.
     Display files with extensions in `submit_settings.SUBMIT_VIEWABLE_EXTENSIONS` in browser.
+    Compressed and packed files and files from storages which are not local are streamed (and decompressed on the fly).
     Returns a response object.
     """
     extension = os.path.splitext(filename)[1]
     as_attachment = extension.lower() not in submit_settings.SUBMIT_VIEWABLE_EXTENSIONS
-    if os.path.exists(filepath):
+    path = direct_local_path(filepath)
+    if path is None:
+        if not file_exists(filepath):
+            raise Http404
+        response = FileResponse(open_file(filepath), content_type=mimetypes.guess_type(filename)[0])
+    else:
         response = sendfile(
             request,
-            filepath,
+            path,
             attachment=as_attachment,
             attachment_filename=filename,
         )
-        response['Content-Disposition'] = 'inline; filename="%s"' % filename
-        return response
-    else:
-        raise Http404
+    response['Content-Disposition'] = 'inline; filename="%s"' % filename
+    return response
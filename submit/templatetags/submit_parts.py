@@ -3,6 +3,7 @@ from django import template
 from submit.constants import ReviewResponse
 from submit.forms import submit_form_factory
 from submit.models import Submit
+from submit.submit_helpers import get_submit_list_page
 
 register = template.Library()
 
@@ -29,14 +30,17 @@ def submit_form(receiver, redirect, user, caption=None):
 @register.inclusion_tag('submit/parts/submit_list.html')
 def submit_list(receiver, user):
     """
-    List of all submits for specified user and receiver.
+    List of submits for specified user and receiver, the newest `SUBMIT_LIST_PAGE_SIZE` of them are rendered
+    and older ones are loaded by a button (from view `submit_list_page`).
     """
-    submits = Submit.with_reviews.filter(receiver=receiver, user=user).order_by('-time', '-pk')
+    submits, next_cursor = get_submit_list_page(receiver, user)
 
     data = {
         'user_has_admin_privileges': receiver.has_admin_privileges(user),
         'receiver': receiver,
+        'submits_user': user,
         'submits': submits,
+        'next_cursor': next_cursor,
         'response': ReviewResponse,
         'Submit': Submit,
     }
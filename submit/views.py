@@ -1,7 +1,8 @@
 from django.contrib import messages
+from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
 from django.core.exceptions import PermissionDenied
-from django.http import HttpResponse
+from django.http import HttpResponse, HttpResponseBadRequest, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.utils.module_loading import import_string
 from django.utils.translation import ugettext_lazy as _
@@ -11,15 +12,18 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response as APIResponse
 
 import submit.settings as submit_settings
-from submit.constants import JudgeTestResult, ReviewResponse
+from submit.constants import JudgePriority, JudgeTestResult, ReviewResponse
 from submit.forms import submit_form_factory
 from submit.judge_helpers import (JudgeConnectionError,
                                   create_review_and_send_to_judge,
-                                  parse_protocol)
+                                  parse_partial_protocol, parse_protocol,
+                                  save_partial_protocol, save_protocol,
+                                  save_protocols, save_test_results)
 from submit.models import Review, Submit, SubmitReceiver
-from submit.serializers import ExternalSubmitSerializer
-from submit.submit_helpers import (create_submit, send_file,
-                                   write_chunks_to_file)
+from submit.scoreboard_helpers import get_scoreboard
+from submit.serializers import ExternalSubmitSerializer, ProtocolSerializer
+from submit.storage import open_file, remove_file
+from submit.submit_helpers import create_submit, get_submit_list_page, send_file
 
 
 @login_required
@@ -47,7 +51,7 @@ def post_submit_form(request, receiver_id):
 
     if receiver.send_to_judge:
         try:
-            create_review_and_send_to_judge(submit)
+            create_review_and_send_to_judge(submit, priority=JudgePriority.HIGH)
         except JudgeConnectionError:
             messages.add_message(request, messages.ERROR, _('Upload to judge was not successful.'))
             return redirect(request.POST['redirect_to'])
@@ -73,10 +77,16 @@ def view_submit(request, submit_id):
     }
 
     if receiver.show_submitted_file:
-        with open(submit.file_path(), 'rb') as submitted_file:
+        with open_file(submit.file_path()) as submitted_file:
             data['submitted_file'] = submitted_file.read().decode('utf-8', 'replace')
 
-    if receiver.send_to_judge and review and review.protocol_exists():
+    if receiver.send_to_judge and review and review.short_response == ReviewResponse.TESTING:
+        force_show_details = receiver.show_all_details or user_has_admin_privileges
+        data['protocol'] = parse_partial_protocol(review.partial_protocol_path(), force_show_details)
+        data['result'] = JudgeTestResult
+    # Reviews waiting for judge have no protocol, looking up a missing file is not cheap
+    elif receiver.send_to_judge and review and review.short_response not in ReviewResponse.PENDING \
+            and review.protocol_exists():
         force_show_details = receiver.show_all_details or user_has_admin_privileges
         data['protocol'] = parse_protocol(review.protocol_path(), force_show_details)
         data['result'] = JudgeTestResult
@@ -84,6 +94,34 @@ def view_submit(request, submit_id):
     return render(request, 'submit/view_submit.html', data)
 
 
+@login_required
+def submit_list_page(request, receiver_id):
+    """
+    Rows of the submit list (templatetag `submit_list`) older than the cursor in the GET parameter `after`.
+    The list shows submits of the user with id in the GET parameter `user`, only admins can list other users.
+    """
+    receiver = get_object_or_404(SubmitReceiver, pk=receiver_id)
+    user_id = request.GET.get('user', str(request.user.pk))
+    if not user_id.isdigit():
+        return HttpResponseBadRequest('Invalid user.')
+    if int(user_id) != request.user.pk and not receiver.has_admin_privileges(request.user):
+        raise PermissionDenied()
+    submits_user = get_object_or_404(get_user_model(), pk=user_id)
+    try:
+        submits, next_cursor = get_submit_list_page(receiver, submits_user, request.GET.get('after'))
+    except ValueError:
+        return HttpResponseBadRequest('Invalid cursor.')
+    data = {
+        'receiver': receiver,
+        'submits_user': submits_user,
+        'submits': submits,
+        'next_cursor': next_cursor,
+        'response': ReviewResponse,
+        'Submit': Submit,
+    }
+    return render(request, 'submit/parts/submit_list_rows.html', data)
+
+
 @login_required
 def download_submit(request, submit_id):
     submit = get_object_or_404(Submit.objects.select_related('receiver'), pk=submit_id)
@@ -110,19 +148,48 @@ def receive_protocol(request):
     review_id = request.POST['submit_id']
     review = get_object_or_404(Review, pk=review_id)
     protocol = request.POST['protocol'].encode('utf-8')
-    write_chunks_to_file(review.protocol_path(), [protocol])
-
-    protocol_data = parse_protocol(review.protocol_path())
+    if request.POST.get('partial'):
+        # only results of the tests finished since the last request
+        tests_total = request.POST.get('tests_total') or None
+        if tests_total is not None:
+            if not tests_total.isdigit():
+                return HttpResponseBadRequest('tests_total must be a non-negative integer.')
+            tests_total = int(tests_total)
+        save_partial_protocol(review, protocol, tests_total)
+        return HttpResponse("")
+
+    protocol_data = save_protocol(review.protocol_path(), protocol)
+    remove_file(review.partial_protocol_path())
     if protocol_data['ready']:
         review.score = protocol_data['score']
         review.short_response = protocol_data['final_result']
     else:
         review.short_response = ReviewResponse.PROTOCOL_CORRUPTED
     review.save()
+    save_test_results(review, protocol_data)
 
     return HttpResponse("")
 
 
+@api_view(['POST'])
+@permission_classes([])
+def receive_protocols(request):
+    """
+    Receive many protocols from judge at once, as a JSON list of {"submit_id": ..., "protocol": ...}.
+    Responds with a status of each protocol.
+    """
+    serializer = ProtocolSerializer(data=request.data, many=True)
+    serializer.is_valid(raise_exception=True)
+
+    # judge expects submit_id, but at front-end it is Review that stores all feedback data
+    statuses = save_protocols([
+        (item['submit_id'], item['protocol'].encode('utf-8')) for item in serializer.validated_data
+    ])
+    return APIResponse([
+        {'submit_id': item['submit_id'], 'status': statuses[item['submit_id']]} for item in serializer.validated_data
+    ])
+
+
 @api_view(['POST'])
 @permission_classes([])
 def external_submit(request):
@@ -143,3 +210,16 @@ def external_submit(request):
     review.save()
 
     return APIResponse()
+
+
+@login_required
+def scoreboard(request):
+    """
+    Scoreboard of tasks given by their ids in the GET parameter `tasks` (comma separated), as JSON.
+    """
+    task_ids = [task_id for task_id in request.GET.get('tasks', '').split(',') if task_id]
+    if not task_ids:
+        return HttpResponseBadRequest('No tasks given.')
+    if not import_string(submit_settings.SUBMIT_CAN_VIEW_SCOREBOARD)(task_ids, request.user):
+        raise PermissionDenied()
+    return JsonResponse({'tasks': task_ids, 'rows': get_scoreboard(task_ids)})